@@ -1,22 +1,31 @@
 import argparse
 import logging
+import re
+import sys
 from finanseer.db import init_db, get_db
-from finanseer.importers import import_rabobank_csv, import_budget_categories
-from finanseer.exporters import export_transactions_to_ynab_csv
 from finanseer.core import (
     get_uncategorized_transactions,
+    count_uncategorized_transactions,
     get_all_categories,
     set_category_for_transactions,
     get_transactions_by_text,
     add_rule,
     apply_rules,
 )
+from finanseer.exporters import export_transactions_to_ynab_csv
 from finanseer import models
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+REVIEW_PAGE_SIZE = 20
+
+_SELECTION_RE = re.compile(r"(\d+)(?:-(\d+))?")
+
 def handle_import(args):
     """Handles the import command."""
+    # Imported here, as pandas is slow to import and only needed by this command
+    from finanseer.importers import import_rabobank_csv, import_budget_categories
+
     logging.info("Starting data import process...")
     db_session_generator = get_db()
     db = next(db_session_generator)
@@ -38,6 +47,13 @@ def handle_import(args):
     finally:
         db.close()
 
+def _import_if_empty(db):
+    """Runs the import only if the database does not hold any transactions yet."""
+    if db.query(models.Transaction.id).first() is None:
+        handle_import(argparse.Namespace(and_list=False))
+    else:
+        logging.info("Transactions already present, skipping import.")
+
 def handle_export(args):
     """Handles the export command."""
     logging.info("Starting data export process...")
@@ -50,6 +66,13 @@ def handle_export(args):
     finally:
         db.close()
 
+def _flatten_subcategories(categories):
+    """
+    Returns all subcategories as a flat tuple, in the order they are numbered for the user.
+    Relies on `get_all_categories` returning categories and subcategories sorted by name.
+    """
+    return tuple(sub for cat in categories for sub in cat.subcategories)
+
 def handle_list_categories(args):
     """Handles the list-categories command."""
     db_session_generator = get_db()
@@ -62,35 +85,50 @@ def handle_list_categories(args):
 
         print("Available categories and subcategories:\n")
 
-        flat_list = []
-        for cat in categories:
-            for sub in sorted(cat.subcategories, key=lambda s: s.name):
-                flat_list.append(sub)
-
-        for i, sub in enumerate(flat_list, 1):
+        for i, sub in enumerate(_flatten_subcategories(categories), 1):
             print(f"  {i: >3} | {sub.category.name: <20} | {sub.name}")
 
     finally:
         db.close()
 
+def _parse_selection(user_input, count):
+    """
+    Parses a selection like "1,2,5-7" into zero-based indices below `count`.
+    Ranges are clamped to the available items, and duplicates are dropped while
+    keeping the order in which they were entered.
+    """
+    indices = []
+    for match in _SELECTION_RE.finditer(user_input):
+        start = int(match.group(1)) - 1
+        end = int(match.group(2) or match.group(1))
+        indices.extend(range(max(0, start), min(count, end)))
+    return list(dict.fromkeys(indices))
+
 def handle_review(args):
     """Handles the interactive transaction review and categorization command."""
     db_session_generator = get_db()
     db = next(db_session_generator)
     try:
-        # HACK: Re-import data to ensure it exists in the ephemeral environment for review.
+        # HACK: Import data if the database is empty, e.g. in an ephemeral environment.
         # In a real-world scenario, the database would be persistent.
-        handle_import(argparse.Namespace())
+        _import_if_empty(db)
+
+        # Categories don't change during a review session, so number them once
+        flat_subcategories = _flatten_subcategories(get_all_categories(db))
 
         while True:
-            transactions = get_uncategorized_transactions(db, sort_by=args.sort_by)
+            transactions = get_uncategorized_transactions(db, sort_by=args.sort_by, limit=REVIEW_PAGE_SIZE)
             if not transactions:
                 print("No more uncategorized transactions to review. Well done!")
                 break
 
-            print(f"\nFound {len(transactions)} uncategorized transactions to review (showing first 20):\n")
-            for i, t in enumerate(transactions[:20], 1):
-                print(f"  {i: >3} | {t.transaction_date} | {t.amount: >8.2f} {t.currency} | {t.counterparty_name or 'N/A': <35} | {t.description_raw or 'N/A'}")
+            total = count_uncategorized_transactions(db)
+            print(f"\nFound {total} uncategorized transactions to review (showing first {len(transactions)}):\n")
+            lines = [
+                f"  {i: >3} | {t.transaction_date} | {t.amount: >8.2f} {t.currency} | {t.counterparty_name or 'N/A': <35} | {t.description_raw or 'N/A'}"
+                for i, t in enumerate(transactions, 1)
+            ]
+            sys.stdout.write("\n".join(lines) + "\n")
 
             print("\nEnter transaction numbers to categorize (e.g., 1,2,5-7), 'l' to list categories, or 'q' to quit.")
             user_input = input("> ")
@@ -103,16 +141,7 @@ def handle_review(args):
 
             try:
                 # Parse transaction numbers (e.g., "1,2,5-7")
-                selected_indices = set()
-                parts = user_input.split(',')
-                for part in parts:
-                    if '-' in part:
-                        start, end = map(int, part.split('-'))
-                        selected_indices.update(range(start - 1, end))
-                    else:
-                        selected_indices.add(int(part) - 1)
-
-                selected_transactions = [transactions[i] for i in sorted(list(selected_indices)) if i < len(transactions)]
+                selected_transactions = [transactions[i] for i in _parse_selection(user_input, len(transactions))]
                 if not selected_transactions:
                     print("Invalid selection.")
                     continue
@@ -125,20 +154,17 @@ def handle_review(args):
 
                 cat_index = int(cat_input) - 1
 
-                # Flatten categories to get the selected one
-                all_categories = get_all_categories(db)
-                flat_subcategories = []
-                for cat in sorted(all_categories, key=lambda x: x.name):
-                    for sub in sorted(cat.subcategories, key=lambda s: s.name):
-                        flat_subcategories.append(sub)
-
                 if 0 <= cat_index < len(flat_subcategories):
                     chosen_subcategory = flat_subcategories[cat_index]
                     transaction_ids = [t.id for t in selected_transactions]
-                    set_category_for_transactions(db, transaction_ids, chosen_subcategory.id)
+                    # Committed right away, so no write lock is held while waiting for input
+                    updated_count = set_category_for_transactions(db, transaction_ids, chosen_subcategory.id)
+                    if not updated_count:
+                        print("The categorization could not be saved, see the log for details.")
+                        continue
 
                     # B2: Rule creation suggestion
-                    print(f"Successfully categorized {len(transaction_ids)} transaction(s).")
+                    print(f"Successfully categorized {updated_count} transaction(s).")
                     print("\nTo create a rule for this, you could use a command like:")
 
                     # Suggest a rule based on counterparty name if available
@@ -165,17 +191,20 @@ def handle_bulk_categorize(args):
     db_session_generator = get_db()
     db = next(db_session_generator)
     try:
-        transactions = get_transactions_by_text(db, args.text)
+        transactions = get_transactions_by_text(db, args.text, match_mode=args.match)
 
         if not transactions:
             print(f"No transactions found matching '{args.text}'.")
             return
 
         print(f"Found {len(transactions)} matching transactions for the pattern '{args.text}':\n")
-        for t in transactions[:10]: # Preview first 10
-            print(f"  {t.transaction_date} | {t.amount: >8.2f} {t.currency} | {t.counterparty_name or 'N/A': <35} | {t.description_raw or 'N/A'}")
+        lines = [
+            f"  {t.transaction_date} | {t.amount: >8.2f} {t.currency} | {t.counterparty_name or 'N/A': <35} | {t.description_raw or 'N/A'}"
+            for t in transactions[:10] # Preview first 10
+        ]
         if len(transactions) > 10:
-            print(f"  ...and {len(transactions) - 10} more.")
+            lines.append(f"  ...and {len(transactions) - 10} more.")
+        sys.stdout.write("\n".join(lines) + "\n")
 
         confirm = input(f"\nProceed with assigning category ID {args.category_id} to these {len(transactions)} transactions? (y/n): ").lower()
 
@@ -210,7 +239,7 @@ def handle_apply_rules(args):
     db = next(db_session_generator)
     try:
         # HACK: Ensure data is present for the demo
-        handle_import(argparse.Namespace(and_list=False))
+        _import_if_empty(db)
 
         count = apply_rules(db, dry_run=args.dry_run)
 
@@ -251,6 +280,7 @@ def main():
     parser_bulk = subparsers.add_parser('bulk-categorize', help='Categorize multiple transactions based on a text pattern.')
     parser_bulk.add_argument('text', type=str, help='The text pattern to search for in payee and description.')
     parser_bulk.add_argument('category_id', type=int, help='The numeric ID of the subcategory to assign.')
+    parser_bulk.add_argument('--match', type=str, choices=['contains', 'prefix', 'suffix'], default='contains', help='Where the text pattern must occur in the payee or description.')
     parser_bulk.set_defaults(func=handle_bulk_categorize)
 
     # Add Rule command
@@ -1,38 +1,126 @@
 import logging
-from typing import List
+import re
+from operator import itemgetter
+from typing import Dict, List, Optional
 
-from sqlalchemy import or_
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import bindparam, func, literal_column, or_, select, update
+from sqlalchemy.orm import Session, joinedload, load_only, selectinload
 
 from . import models
 
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick is optional, rules are matched with a regular expression without it
+    ahocorasick = None
+
+# Maximum number of IDs bound into a single `IN (...)` clause, to stay well below
+# the database's bound-parameter limit.
+UPDATE_BATCH_SIZE = 500
+
+# Assigns a subcategory to a batch of transactions. Built once, so every batch reuses
+# the same cached compiled statement with only the bound values changing.
+_SET_CATEGORY_STATEMENT = (
+    update(models.Transaction)
+    .where(
+        models.Transaction.id.in_(bindparam("ids", expanding=True)),
+        models.Transaction.subcategory_id.is_distinct_from(bindparam("new_subcategory_id")),
+    )
+    .values(subcategory_id=bindparam("new_subcategory_id"))
+    .execution_options(synchronize_session=False)
+)
+
+# Assigns a subcategory to a batch of matched transactions, skipping any that have
+# been categorized since they were matched.
+_CATEGORIZE_UNCATEGORIZED_STATEMENT = (
+    update(models.Transaction)
+    .where(
+        models.Transaction.id.in_(bindparam("ids", expanding=True)),
+        models.Transaction.subcategory_id.is_(None),
+    )
+    .values(subcategory_id=bindparam("new_subcategory_id"))
+    .execution_options(synchronize_session=False)
+)
+
+# Supported ways of matching a text pattern in `get_transactions_by_text`.
+MATCH_MODES = ("contains", "prefix", "suffix")
+
+
+def _uncategorized_transactions_query(db: Session, sort_by: str):
+    """Builds the query for uncategorized transactions, sorted by 'date' or 'amount'."""
+    query = (
+        db.query(models.Transaction)
+        .options(
+            # Only the columns needed to review and match transactions
+            load_only(
+                models.Transaction.id,
+                models.Transaction.transaction_date,
+                models.Transaction.amount,
+                models.Transaction.currency,
+                models.Transaction.counterparty_name,
+                models.Transaction.counterparty_iban,
+                models.Transaction.description_raw,
+                models.Transaction.subcategory_id,
+            )
+        )
+        .filter(models.Transaction.subcategory_id.is_(None))
+    )
+
+    if sort_by == "amount":
+        return query.order_by(models.Transaction.amount.desc())
+    return query.order_by(models.Transaction.transaction_date.desc()) # Default to date
+
 
-def get_uncategorized_transactions(db: Session, sort_by: str = "date") -> List[models.Transaction]:
+def get_uncategorized_transactions(
+    db: Session, sort_by: str = "date", limit: Optional[int] = None, offset: int = 0
+) -> List[models.Transaction]:
     """
-    Fetches all transactions that have not yet been assigned a subcategory.
+    Fetches transactions that have not yet been assigned a subcategory.
 
     Args:
         db: The database session.
         sort_by: The field to sort by ('date' or 'amount').
+        limit: The maximum number of transactions to return. Returns all if None.
+        offset: The number of transactions to skip, for paging through the results.
 
     Returns:
         A list of uncategorized Transaction objects, sorted as specified.
     """
     logging.info(f"Fetching uncategorized transactions, sorting by {sort_by}...")
 
-    query = db.query(models.Transaction).filter(models.Transaction.subcategory_id.is_(None))
-
-    if sort_by == "amount":
-        query = query.order_by(models.Transaction.amount.desc())
-    else: # Default to date
-        query = query.order_by(models.Transaction.transaction_date.desc())
+    query = _uncategorized_transactions_query(db, sort_by)
+    if limit is not None:
+        query = query.limit(limit)
+    if offset:
+        query = query.offset(offset)
 
     transactions = query.all()
 
-    logging.info(f"Found {len(transactions)} uncategorized transactions.")
+    if limit is None:
+        logging.info(f"Found {len(transactions)} uncategorized transactions.")
+    else:
+        # A single page, see `count_uncategorized_transactions` for the total
+        logging.info(f"Loaded {len(transactions)} of the uncategorized transactions.")
     return transactions
 
 
+def count_uncategorized_transactions(db: Session) -> int:
+    """
+    Counts the transactions that have not yet been assigned a subcategory,
+    without loading them.
+
+    Args:
+        db: The database session.
+
+    Returns:
+        The number of uncategorized transactions.
+    """
+    return (
+        db.query(func.count(models.Transaction.id))
+        .filter(models.Transaction.subcategory_id.is_(None))
+        .scalar()
+    )
+
+
 def get_all_categories(db: Session) -> List[models.Category]:
     """
     Fetches all categories and their subcategories from the database,
@@ -42,12 +130,15 @@ def get_all_categories(db: Session) -> List[models.Category]:
         db: The database session.
 
     Returns:
-        A list of all Category objects, with their subcategories pre-loaded.
+        A list of all Category objects sorted by name, with their subcategories
+        pre-loaded and sorted by name.
     """
     logging.info("Fetching all categories...")
     categories = (
         db.query(models.Category)
-        .options(joinedload(models.Category.subcategories))
+        # A second SELECT ... IN for all subcategories, rather than a JOIN that
+        # repeats every category's columns for each of its subcategories
+        .options(selectinload(models.Category.subcategories))
         .order_by(models.Category.name)
         .all()
     )
@@ -55,68 +146,124 @@ def get_all_categories(db: Session) -> List[models.Category]:
     return categories
 
 
-def get_transactions_by_text(db: Session, text_pattern: str) -> List[models.Transaction]:
+def _like_literal(text: str) -> str:
+    """Escapes LIKE wildcards in `text` (with '/' as the escape character), so it matches literally."""
+    return text.replace("/", "//").replace("%", "/%").replace("_", "/_")
+
+
+def get_transactions_by_text(db: Session, text_pattern: str, match_mode: str = "contains") -> List[models.Transaction]:
     """
-    Finds uncategorized transactions that contain a given text pattern in their
-    counterparty name or description.
+    Finds uncategorized transactions whose counterparty name or description
+    contains, starts with or ends with a given text pattern.
 
     Args:
         db: The database session.
         text_pattern: The case-insensitive text to search for.
+        match_mode: Where the pattern must occur: 'contains', 'prefix' or 'suffix'.
+            Prefix searches are served by the case-insensitive column indexes.
 
     Returns:
         A list of matching uncategorized transaction objects.
     """
-    logging.info(f"Searching for uncategorized transactions matching '%{text_pattern}%'...")
+    if match_mode not in MATCH_MODES:
+        raise ValueError(f"Unknown match mode '{match_mode}', expected one of {', '.join(MATCH_MODES)}.")
 
-    pattern = f"%{text_pattern}%"
-    transactions = (
-        db.query(models.Transaction)
-        .filter(
-            models.Transaction.subcategory_id.is_(None),
+    # A blank pattern would match every uncategorized transaction
+    if not text_pattern.strip():
+        logging.warning("Empty search pattern given, no transactions matched.")
+        return []
+
+    logging.info(f"Searching for uncategorized transactions matching '{text_pattern}' ({match_mode})...")
+
+    query = db.query(models.Transaction).filter(models.Transaction.subcategory_id.is_(None))
+
+    if match_mode == "prefix":
+        # Plain LIKE is case-insensitive on SQLite, and with a fixed prefix it becomes
+        # a range search on the NOCASE indexes of both columns.
+        pattern = f"{_like_literal(text_pattern)}%"
+        query = query.filter(
             or_(
-                models.Transaction.counterparty_name.ilike(pattern),
-                models.Transaction.description_raw.ilike(pattern),
-            ),
+                models.Transaction.counterparty_name.like(pattern, escape="/"),
+                models.Transaction.description_raw.like(pattern, escape="/"),
+            )
+        )
+    # The trigram index only matches patterns of at least three characters.
+    elif db.get_bind().dialect.name == "sqlite" and len(text_pattern) >= 3:
+        fts_phrase = '"' + text_pattern.replace('"', '""') + '"'
+        query = query.filter(
+            literal_column("transactions.rowid").in_(
+                select(models.transactions_fts.c.rowid).where(
+                    literal_column("transactions_fts").match(fts_phrase)
+                )
+            )
+        )
+    else:
+        pattern = f"%{_like_literal(text_pattern)}%"
+        query = query.filter(
+            or_(
+                models.Transaction.counterparty_name.ilike(pattern, escape="/"),
+                models.Transaction.description_raw.ilike(pattern, escape="/"),
+            )
+        )
+
+    if match_mode == "suffix":
+        # Narrowed down by the contains search above, then checked for the suffix
+        pattern = f"%{_like_literal(text_pattern)}"
+        query = query.filter(
+            or_(
+                models.Transaction.counterparty_name.ilike(pattern, escape="/"),
+                models.Transaction.description_raw.ilike(pattern, escape="/"),
+            )
         )
-        .order_by(models.Transaction.transaction_date.desc())
-        .all()
-    )
+
+    transactions = query.order_by(models.Transaction.transaction_date.desc()).all()
 
     logging.info(f"Found {len(transactions)} matching transactions.")
     return transactions
 
 
-def set_category_for_transactions(db: Session, transaction_ids: List[str], subcategory_id: int):
+def set_category_for_transactions(db: Session, transaction_ids: List[str], subcategory_id: int) -> int:
     """
-    Assigns a subcategory to a list of transactions.
+    Assigns a subcategory to a list of transactions. Transactions that already
+    have this subcategory, or IDs that don't exist, are left untouched.
 
     Args:
         db: The database session.
         transaction_ids: A list of transaction IDs to update.
         subcategory_id: The ID of the subcategory to assign.
+
+    Returns:
+        The number of transactions that were updated.
     """
     # Verify the subcategory exists
-    subcategory = db.query(models.Subcategory).filter(models.Subcategory.id == subcategory_id).first()
+    subcategory = (
+        db.query(models.Subcategory)
+        .options(joinedload(models.Subcategory.category))
+        .filter(models.Subcategory.id == subcategory_id)
+        .first()
+    )
     if not subcategory:
         logging.error(f"No subcategory found with ID {subcategory_id}. Aborting.")
-        return
+        return 0
 
     logging.info(f"Assigning category '{subcategory.category.name}: {subcategory.name}' to {len(transaction_ids)} transactions.")
 
-    # Update transactions
-    (
-        db.query(models.Transaction)
-        .filter(models.Transaction.id.in_(transaction_ids))
-        .update({"subcategory_id": subcategory_id}, synchronize_session=False)
-    )
-
     try:
+        # Update transactions in batches, all within the same DB transaction
+        updated_count = 0
+        for i in range(0, len(transaction_ids), UPDATE_BATCH_SIZE):
+            batch = transaction_ids[i:i + UPDATE_BATCH_SIZE]
+            result = db.execute(_SET_CATEGORY_STATEMENT, {"ids": batch, "new_subcategory_id": subcategory_id})
+            updated_count += result.rowcount
+
         db.commit()
-        logging.info("Successfully updated transactions.")
+        logging.info(f"Successfully updated {updated_count} transactions.")
     except Exception as e:
         db.rollback()
         logging.error(f"Failed to update transactions in DB: {e}")
+        return 0
+
+    return updated_count
 
 
 def add_rule(db: Session, type: str, pattern: str, subcategory_id: int, priority: int = 100):
@@ -131,7 +278,12 @@ def add_rule(db: Session, type: str, pattern: str, subcategory_id: int, priority
         priority: The priority of the rule.
     """
     # Verify the subcategory exists
-    subcategory = db.query(models.Subcategory).filter(models.Subcategory.id == subcategory_id).first()
+    subcategory = (
+        db.query(models.Subcategory)
+        .options(joinedload(models.Subcategory.category))
+        .filter(models.Subcategory.id == subcategory_id)
+        .first()
+    )
     if not subcategory:
         logging.error(f"No subcategory found with ID {subcategory_id}. Rule not created.")
         return
@@ -154,9 +306,114 @@ def add_rule(db: Session, type: str, pattern: str, subcategory_id: int, priority
         logging.error(f"Failed to add rule to DB: {e}")
 
 
+def _compile_substring_matcher(ranked_patterns: Dict[str, tuple]):
+    """
+    Compiles patterns into a function that returns the lowest-ranked entry whose
+    pattern occurs in a given text, or None. The empty pattern occurs in any text,
+    including the empty one.
+
+    With pyahocorasick installed, the patterns form one Aho-Corasick automaton, which
+    scans a text in linear time whatever the number of patterns. Otherwise they form
+    one regular expression, whose alternatives are tried in rank order at every
+    position of the text.
+
+    Args:
+        ranked_patterns: A dict mapping lowercase patterns to their (rank, rule) entry.
+
+    Returns:
+        The matching function.
+    """
+    empty_pattern_entry = ranked_patterns.get("")
+    patterns = {pattern: entry for pattern, entry in ranked_patterns.items() if pattern}
+
+    if not patterns:
+        def scan(text):
+            return []
+    elif ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for pattern, entry in patterns.items():
+            automaton.add_word(pattern, entry)
+        automaton.make_automaton()
+
+        def scan(text):
+            return [entry for _, entry in automaton.iter(text)]
+    else:
+        # A lookahead reports a match at every position, including overlapping ones
+        matcher = re.compile("(?=(" + "|".join(map(re.escape, sorted(patterns, key=lambda p: patterns[p][0]))) + "))")
+
+        def scan(text):
+            return [patterns[pattern] for pattern in matcher.findall(text)]
+
+    def best_match(text):
+        found = scan(text)
+        if empty_pattern_entry is not None:
+            found.append(empty_pattern_entry)
+        return min(found, key=itemgetter(0), default=None)
+
+    return best_match
+
+
+def _match_rules(db: Session, rules: List[models.Rule]) -> Dict[int, List[str]]:
+    """
+    Finds the first rule, in the given order, that matches each uncategorized
+    transaction, in a single pass over the uncategorized transactions:
+    - IBAN rules are exact matches, looked up in a dict by counterparty IBAN.
+    - COUNTERPARTY_NAME and DESCRIPTION_CONTAINS rules are substring matches, against
+      the lowercase counterparty name and the normalized description. The patterns of
+      each type are compiled into a single matcher (see `_compile_substring_matcher`),
+      so every transaction is scanned once, however many rules there are. An empty
+      pattern matches any value that is present, even a description that normalizes
+      to ''.
+
+    Args:
+        db: The database session.
+        rules: The rules, in order of precedence, all of a known type.
+
+    Returns:
+        A dict mapping rule IDs to the IDs of the transactions they match first.
+    """
+    from .schemas import RuleType
+
+    columns = {
+        RuleType.IBAN.value: models.Transaction.counterparty_iban,
+        RuleType.COUNTERPARTY_NAME.value: models.Transaction.counterparty_name_lower,
+        RuleType.DESCRIPTION_CONTAINS.value: models.Transaction.description_normalized,
+    }
+    # Per rule type, the rank and first rule of each pattern. Rules repeating an
+    # earlier pattern of the same type can never match first, so they are dropped.
+    ranked_rules = {rule_type: {} for rule_type in columns}
+    for rank, rule in enumerate(rules):
+        pattern = rule.pattern if rule.type == RuleType.IBAN.value else rule.pattern.lower()
+        ranked_rules[rule.type].setdefault(pattern, (rank, rule))
+
+    matchers = []
+    for position, (rule_type, ranked_patterns) in enumerate(ranked_rules.items(), start=1):
+        if not ranked_patterns:
+            continue
+        if rule_type == RuleType.IBAN.value:
+            matchers.append((position, ranked_patterns.get))
+        else:
+            matchers.append((position, _compile_substring_matcher(ranked_patterns)))
+
+    matches = {}
+    rows = db.execute(
+        select(models.Transaction.id, *columns.values()).where(models.Transaction.subcategory_id.is_(None))
+    )
+    for row in rows:
+        found = [match(row[position]) for position, match in matchers if row[position] is not None]
+        best = min(filter(None, found), key=itemgetter(0), default=None)
+        if best is not None:
+            matches.setdefault(best[1].id, []).append(row[0])
+    return matches
+
+
 def apply_rules(db: Session, dry_run: bool = False) -> int:
     """
-    Applies all active rules to uncategorized transactions.
+    Applies all active rules to uncategorized transactions. Each transaction gets the
+    subcategory of the first rule that matches it, in order of priority (lowest number
+    first, then lowest ID). All rules are matched in one pass over the uncategorized
+    transactions (see `_match_rules`), after which the matches are written with one
+    UPDATE per subcategory.
 
     Args:
         db: The database session.
@@ -165,56 +422,57 @@ def apply_rules(db: Session, dry_run: bool = False) -> int:
     Returns:
         The number of transactions that were categorized.
     """
-    from .text_processing import normalize_description
     from .schemas import RuleType
 
     logging.info(f"Starting rule application process. Dry run: {dry_run}")
 
-    rules = db.query(models.Rule).order_by(models.Rule.priority).all()
+    # The subcategory and its category are loaded up front, as they are logged per rule
+    rules = (
+        db.query(models.Rule)
+        .options(joinedload(models.Rule.subcategory).joinedload(models.Subcategory.category))
+        .order_by(models.Rule.priority, models.Rule.id)
+        .all()
+    )
     if not rules:
         logging.warning("No rules found in the database. Aborting.")
         return 0
 
-    transactions = get_uncategorized_transactions(db)
-    if not transactions:
-        logging.info("No uncategorized transactions to process.")
-        return 0
+    known_types = {rule_type.value for rule_type in RuleType}
+    for rule in rules:
+        if rule.type not in known_types:
+            logging.warning(f"Skipping rule ID {rule.id} with unknown type '{rule.type}'.")
+    rules = [rule for rule in rules if rule.type in known_types]
+    matches = _match_rules(db, rules) if rules else {}
+
+    ids_by_subcategory = {}
+    for rule in rules:
+        matched_ids = matches.get(rule.id)
+        if not matched_ids:
+            continue
+        ids_by_subcategory.setdefault(rule.subcategory_id, []).extend(matched_ids)
+        logging.info(
+            f"{'[Dry Run] ' if dry_run else ''}Rule ID {rule.id} (pattern: '{rule.pattern}') "
+            f"{'would categorize' if dry_run else 'categorized'} {len(matched_ids)} transactions as "
+            f"'{rule.subcategory.category.name}: {rule.subcategory.name}'."
+        )
+
+    if dry_run:
+        return sum(len(ids) for ids in ids_by_subcategory.values())
 
     categorized_count = 0
-    for t in transactions:
-        for rule in rules:
-            matched = False
-            # Check for match based on rule type
-            if rule.type == RuleType.IBAN.value and t.counterparty_iban == rule.pattern:
-                matched = True
-            elif rule.type == RuleType.COUNTERPARTY_NAME.value and t.counterparty_name and rule.pattern.lower() in t.counterparty_name.lower():
-                matched = True
-            elif rule.type == RuleType.DESCRIPTION_CONTAINS.value and t.description_raw:
-                normalized_desc = normalize_description(t.description_raw)
-                if rule.pattern.lower() in normalized_desc:
-                    matched = True
-
-            if matched:
-                categorized_count += 1
-                if dry_run:
-                    logging.info(
-                        f"[Dry Run] Transaction '{t.id[:8]}...' ({t.counterparty_name}) would be categorized as "
-                        f"'{rule.subcategory.category.name}: {rule.subcategory.name}' by rule ID {rule.id} (pattern: '{rule.pattern}')."
-                    )
-                else:
-                    logging.info(
-                        f"Transaction '{t.id[:8]}...' ({t.counterparty_name}) categorized as "
-                        f"'{rule.subcategory.category.name}: {rule.subcategory.name}' by rule ID {rule.id}."
-                    )
-                    t.subcategory_id = rule.subcategory_id
-                break  # Stop processing rules for this transaction
-
-    if not dry_run:
-        try:
-            db.commit()
-            logging.info(f"Successfully committed {categorized_count} new categorizations.")
-        except Exception as e:
-            db.rollback()
-            logging.error(f"Failed to commit categorizations: {e}")
+    for subcategory_id, transaction_ids in ids_by_subcategory.items():
+        for i in range(0, len(transaction_ids), UPDATE_BATCH_SIZE):
+            result = db.execute(
+                _CATEGORIZE_UNCATEGORIZED_STATEMENT,
+                {"ids": transaction_ids[i:i + UPDATE_BATCH_SIZE], "new_subcategory_id": subcategory_id},
+            )
+            categorized_count += result.rowcount
+
+    try:
+        db.commit()
+        logging.info(f"Successfully committed {categorized_count} new categorizations.")
+    except Exception as e:
+        db.rollback()
+        logging.error(f"Failed to commit categorizations: {e}")
 
     return categorized_count
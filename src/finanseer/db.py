@@ -1,22 +1,152 @@
 import logging
-from sqlalchemy import create_engine
+from sqlalchemy import bindparam, create_engine, event, inspect, select, update
+from sqlalchemy.engine import Connection, Engine
 from sqlalchemy.orm import sessionmaker
 
-from finanseer.models import Base
+from finanseer.models import (
+    Base,
+    TRANSACTION_DERIVED_COLUMNS,
+    TRANSACTIONS_FTS_DDL,
+    TRANSACTIONS_FTS_REBUILD,
+    Transaction,
+)
 
 DATABASE_URL = "sqlite:///finanseer.db"
 
 engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Objects are not expired on commit, so reading them afterwards (e.g. for logging)
+# does not re-SELECT them. Bulk UPDATEs bypass loaded objects, so call
+# `session.refresh()` or `session.expire_all()` to see values changed in the database.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
-def init_db():
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Switches SQLite to write-ahead logging with relaxed syncing, so a commit no
+    longer waits for an fsync of the database file. Temporary tables are kept in
+    memory, and reads go through a 256 MiB memory map and a 64 MiB page cache.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.execute("PRAGMA cache_size=-65536")
+    cursor.close()
+
+
+def _add_derived_columns(connection: Connection):
+    """
+    Adds the derived columns that a `transactions` table created by an earlier
+    version lacks, and fills them in for the transactions already stored.
     """
-    Initializes the database by creating all tables defined in the Base metadata.
+    transactions = Transaction.__table__
+    existing_columns = {row[1] for row in connection.exec_driver_sql("PRAGMA table_info(transactions)")}
+
+    for column_name, (source_name, derive) in TRANSACTION_DERIVED_COLUMNS.items():
+        if column_name in existing_columns:
+            continue
+
+        column_type = transactions.c[column_name].type.compile(dialect=connection.dialect)
+        connection.exec_driver_sql(f"ALTER TABLE transactions ADD COLUMN {column_name} {column_type}")
+
+        source = transactions.c[source_name]
+        rows = connection.execute(select(transactions.c.id, source).where(source.is_not(None))).all()
+        if rows:
+            connection.execute(
+                update(transactions)
+                .where(transactions.c.id == bindparam("row_id"))
+                .values({column_name: bindparam("derived_value")}),
+                [{"row_id": row_id, "derived_value": derive(value)} for row_id, value in rows],
+            )
+        logging.info(f"Added column '{column_name}' to transactions and filled it in for {len(rows)} transactions.")
+
+
+def _fill_in_empty_derived_values(connection: Connection):
+    """
+    Brings derived values stored by an earlier version in line with the current
+    derivation: descriptions that normalize to nothing were stored as NULL rather
+    than '', and empty counterparty names as '' rather than NULL.
+    """
+    transactions = Transaction.__table__
+    connection.execute(
+        update(transactions)
+        .where(
+            transactions.c.description_normalized.is_(None),
+            transactions.c.description_raw.is_not(None),
+            transactions.c.description_raw != "",
+        )
+        .values(description_normalized="")
+    )
+    connection.execute(
+        update(transactions)
+        .where(transactions.c.counterparty_name == "", transactions.c.counterparty_name_lower.is_not(None))
+        .values(counterparty_name_lower=None)
+    )
+
+
+def _create_missing_indexes(connection: Connection):
+    """Creates the indexes that tables created by an earlier version lack."""
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if not inspector.has_index(table.name, index.name):
+                index.create(connection)
+                logging.info(f"Created index '{index.name}' on {table.name}.")
+
+
+def _create_full_text_index(connection: Connection):
+    """
+    Creates the full-text index of transactions, with its triggers, if the database
+    lacks it or still has the earlier layout keyed by transaction ID, and indexes
+    the transactions already stored.
+    """
+    existing_sql = connection.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'transactions_fts'"
+    ).scalar()
+    if existing_sql is not None and "content_rowid" in existing_sql:
+        return
+
+    if existing_sql is not None:
+        for trigger in ("transactions_fts_insert", "transactions_fts_delete", "transactions_fts_update"):
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+        connection.exec_driver_sql("DROP TABLE transactions_fts")
+
+    for statement in TRANSACTIONS_FTS_DDL:
+        connection.exec_driver_sql(statement)
+    connection.exec_driver_sql(TRANSACTIONS_FTS_REBUILD)
+    logging.info("Created the full-text index of transactions.")
+
+
+def _upgrade_schema(connection: Connection):
+    """
+    Brings a database created by an earlier version up to the current schema, which
+    `create_all` does not do for tables that already exist. Every step checks what
+    is missing first, so running it on an up-to-date database changes nothing.
+    """
+    _add_derived_columns(connection)
+    _fill_in_empty_derived_values(connection)
+    _create_missing_indexes(connection)
+    if connection.dialect.name == "sqlite":
+        _create_full_text_index(connection)
+
+
+def init_db(bind: Engine = engine):
+    """
+    Initializes the database by creating all tables defined in the Base metadata,
+    and upgrades the tables of a database created by an earlier version.
     This is safe to run multiple times; it won't recreate existing tables.
+
+    Args:
+        bind: The engine of the database to initialize.
     """
     logging.info("Initializing database...")
     try:
-        Base.metadata.create_all(bind=engine)
+        Base.metadata.create_all(bind=bind)
+        # In one transaction, so an interrupted upgrade is rolled back as a whole
+        with bind.begin() as connection:
+            _upgrade_schema(connection)
         logging.info("Database initialized successfully.")
     except Exception as e:
         logging.error(f"Failed to initialize database: {e}")
@@ -1,12 +1,20 @@
+import csv
 import logging
-import pandas as pd
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
+
+from finanseer.models import Transaction, Subcategory
+
+# Number of transactions fetched from the database per round-trip while exporting.
+EXPORT_BATCH_SIZE = 1000
+
+YNAB_COLUMNS = ['Date', 'Payee', 'Memo', 'Outflow', 'Inflow', 'Category']
 
-from finanseer.models import Transaction, Subcategory, Category
 
 def export_transactions_to_ynab_csv(db: Session, filepath: str):
     """
     Exports all transactions from the database to a YNAB-compatible CSV file.
+    Rows are streamed from the database to the file, so memory use does not
+    grow with the number of transactions.
 
     Args:
         db: The database session.
@@ -14,45 +22,46 @@ def export_transactions_to_ynab_csv(db: Session, filepath: str):
     """
     logging.info(f"Starting export of transactions to {filepath}...")
 
-    # Query all transactions, joining with categories to get category names
+    # Query all transactions, loading their subcategory and category in the same query
     transactions_query = (
-        db.query(Transaction, Category.name, Subcategory.name)
-        .outerjoin(Transaction.subcategory)
-        .outerjoin(Subcategory.category)
+        db.query(Transaction)
+        .options(joinedload(Transaction.subcategory).joinedload(Subcategory.category))
         .order_by(Transaction.transaction_date)
-        .all()
     )
 
-    if not transactions_query:
+    if db.query(Transaction.id).first() is None:
         logging.info("No transactions found in the database to export.")
         return
 
-    records = []
-    for transaction, cat_name, sub_name in transactions_query:
-        # Format category string as "Category: Subcategory"
-        category_str = f"{cat_name}: {sub_name}" if cat_name and sub_name else ""
-
-        outflow = None
-        inflow = None
-        if transaction.mutation_type == 'debit':
-            # Format as a string with a dot decimal separator for CSV consistency
-            outflow = f"{transaction.amount:.2f}"
-        else:
-            inflow = f"{transaction.amount:.2f}"
-
-        records.append({
-            'Date': transaction.transaction_date.strftime('%m/%d/%Y'), # YNAB likes MM/DD/YYYY
-            'Payee': transaction.counterparty_name,
-            'Memo': transaction.description_raw,
-            'Outflow': outflow,
-            'Inflow': inflow,
-            'Category': category_str,
-        })
-
-    df = pd.DataFrame(records)
-
+    # Bound once, as the export loop formats every amount
+    format_amount = "{:.2f}".format
+    exported_count = 0
     try:
-        df.to_csv(filepath, index=False, encoding='utf-8')
-        logging.info(f"Successfully exported {len(df)} transactions to {filepath}")
+        with open(filepath, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(YNAB_COLUMNS)
+            for transaction in transactions_query.yield_per(EXPORT_BATCH_SIZE):
+                # Format category string as "Category: Subcategory"
+                subcategory = transaction.subcategory
+                category_str = f"{subcategory.category.name}: {subcategory.name}" if subcategory else ""
+
+                outflow = None
+                inflow = None
+                if transaction.mutation_type == 'debit':
+                    # Format as a string with a dot decimal separator for CSV consistency
+                    outflow = format_amount(transaction.amount)
+                else:
+                    inflow = format_amount(transaction.amount)
+
+                writer.writerow([
+                    transaction.transaction_date.strftime('%m/%d/%Y'), # YNAB likes MM/DD/YYYY
+                    transaction.counterparty_name,
+                    transaction.description_raw,
+                    outflow,
+                    inflow,
+                    category_str,
+                ])
+                exported_count += 1
+        logging.info(f"Successfully exported {exported_count} transactions to {filepath}")
     except Exception as e:
         logging.error(f"Failed to write to CSV file {filepath}: {e}")
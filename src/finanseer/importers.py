@@ -1,38 +1,97 @@
 import logging
-from datetime import datetime
 from decimal import Decimal, InvalidOperation
 from typing import List, Optional
 
+import numpy as np
 import pandas as pd
 from pydantic import ValidationError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
 from finanseer import models
 from finanseer.schemas import Transaction, MutationType, BudgetCategory
 
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:  # pyarrow is optional, pandas' own CSV parser is used without it
+    pa = None
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 
-def _clean_str(value) -> Optional[str]:
-    """Cleans a string value from pandas, handling NaN and stripping whitespace."""
-    if pd.isna(value) or value is None:
+# The columns of a Rabobank export that the importer reads.
+RABOBANK_COLUMNS = [
+    "IBAN/BBAN",
+    "Munt",
+    "Datum",
+    "Bedrag",
+    "Tegenrekening IBAN/BBAN",
+    "Naam tegenpartij",
+    "Omschrijving-1",
+    "Omschrijving-2",
+    "Omschrijving-3",
+]
+
+
+def _read_csv_columns(filepath: str, encoding: str, columns: List[str]) -> pd.DataFrame:
+    """
+    Reads a CSV file with every value as a string and empty values as missing.
+
+    Only `columns` are parsed, by pyarrow's multithreaded reader if it is installed
+    and by pandas' C parser otherwise. With pyarrow, any that are absent from the
+    file come back as all-missing columns; with pandas they are left out.
+
+    Args:
+        filepath: The path of the CSV file.
+        encoding: The encoding of the file.
+        columns: The columns the caller needs.
+
+    Returns:
+        A DataFrame of strings, with None or NaN for missing values.
+    """
+    if pa is None:
+        wanted = set(columns)
+        # A callable rather than the list itself, so columns missing from the file are not an error
+        return pd.read_csv(filepath, encoding=encoding, dtype=str, usecols=lambda column: column in wanted)
+
+    table = pa_csv.read_csv(
+        filepath,
+        read_options=pa_csv.ReadOptions(encoding=encoding),
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={column: pa.string() for column in columns},
+            strings_can_be_null=True,
+            include_columns=columns,
+            include_missing_columns=True,
+        ),
+    )
+    return table.to_pandas()
+
+
+def _to_decimal(value: str) -> Optional[Decimal]:
+    """Parses an amount like '+21,00', returning None if it isn't a finite number."""
+    try:
+        amount = Decimal(value.replace(",", "."))
+    except InvalidOperation:
         return None
-    return str(value).strip()
+    return amount if amount.is_finite() else None
+
+
+def _join_non_empty(left: pd.Series, right: pd.Series) -> pd.Series:
+    """Joins two string columns element-wise with a space, leaving out empty values."""
+    separator = pd.Series(np.where((left != "") & (right != ""), " ", ""), index=left.index)
+    return left + separator + right
 
 
 def import_rabobank_csv(db: Session, filepath: str):
     """
     Imports transactions from a Rabobank CSV file and persists them to the database.
-    Handles duplicates within the same file by skipping them.
+    Handles duplicates within the same file, and transactions already in the
+    database, by skipping them.
     """
     try:
-        df = pd.read_csv(
-            filepath,
-            encoding="latin-1",
-            decimal=",",
-            thousands=".",
-            dtype=str,
-        )
+        df = _read_csv_columns(filepath, "latin-1", RABOBANK_COLUMNS)
     except FileNotFoundError:
         logging.error(f"File not found: {filepath}")
         return
@@ -40,72 +99,76 @@ def import_rabobank_csv(db: Session, filepath: str):
         logging.error(f"Failed to read CSV file {filepath}: {e}")
         return
 
-    transactions_processed = 0
-    skipped_rows = 0
-    processed_ids = set()
-
-    for index, row in df.iterrows():
-        try:
-            account_id = _clean_str(row.get("IBAN/BBAN"))
-            transaction_date_str = _clean_str(row.get("Datum"))
-            amount_str = _clean_str(row.get("Bedrag"))
-            currency = _clean_str(row.get("Munt"))
-
-            if not all([account_id, transaction_date_str, amount_str, currency]):
-                logging.warning(f"Skipping row {index + 2}: missing essential data.")
-                skipped_rows += 1
-                continue
-
-            transaction_date = datetime.strptime(transaction_date_str, "%Y-%m-%d").date()
-            amount_decimal = Decimal(amount_str.replace(",", "."))
-            mutation_type = MutationType.CREDIT if amount_decimal >= 0 else MutationType.DEBIT
-            amount_abs = abs(amount_decimal)
-
-            counterparty_iban = _clean_str(row.get("Tegenrekening IBAN/BBAN"))
-            counterparty_name = _clean_str(row.get("Naam tegenpartij"))
-            desc_parts = [_clean_str(row.get(f"Omschrijving-{i}")) for i in range(1, 4)]
-            description_raw = " ".join(p for p in desc_parts if p).strip() or None
-
-            transaction_id = Transaction.generate_id(
-                transaction_date=transaction_date,
-                amount=amount_abs,
-                counterparty_iban=counterparty_iban,
-                counterparty_name=counterparty_name,
-                description=description_raw,
-            )
-
-            if transaction_id in processed_ids:
-                logging.warning(f"Skipping duplicate transaction in file (ID: {transaction_id[:8]}...)")
-                skipped_rows += 1
-                continue
-
-            processed_ids.add(transaction_id)
-
-            db_transaction = models.Transaction(
-                id=transaction_id,
-                account_id=account_id,
-                transaction_date=transaction_date,
-                amount=amount_abs,
-                currency=currency,
-                counterparty_name=counterparty_name,
-                counterparty_iban=counterparty_iban,
-                description_raw=description_raw,
-                mutation_type=mutation_type.value,
-                bank_source="Rabobank",
-            )
-            db.merge(db_transaction)
-            transactions_processed += 1
-
-        except (InvalidOperation, ValueError) as e:
-            logging.warning(f"Skipping row {index + 2} due to parsing error: {e}")
-            skipped_rows += 1
-        except Exception as e:
-            logging.error(f"An unexpected error occurred at row {index + 2}: {e}")
-            skipped_rows += 1
+    # Work on whole columns rather than row by row. Row numbers in log messages are
+    # the DataFrame index + 2, to account for the header and 1-based numbering.
+    df = df.reindex(columns=RABOBANK_COLUMNS).astype(object).apply(lambda column: column.str.strip())
+
+    essential = df[["IBAN/BBAN", "Datum", "Bedrag", "Munt"]]
+    missing = (essential.isna() | (essential == "")).any(axis=1)
+    for index in df.index[missing]:
+        logging.warning(f"Skipping row {index + 2}: missing essential data.")
+    df = df[~missing]
+
+    dates = pd.to_datetime(df["Datum"], format="%Y-%m-%d", errors="coerce")
+    amounts = df["Bedrag"].map(_to_decimal)
+    invalid = dates.isna() | amounts.isna()
+    for index in df.index[invalid]:
+        logging.warning(
+            f"Skipping row {index + 2} due to parsing error: "
+            f"invalid date '{df.at[index, 'Datum']}' or amount '{df.at[index, 'Bedrag']}'."
+        )
+    df, dates, amounts = df[~invalid], dates[~invalid].dt.date, amounts[~invalid]
+
+    mutation_types = pd.Series(
+        np.where(amounts >= 0, MutationType.CREDIT.value, MutationType.DEBIT.value), index=df.index
+    )
+    amounts = amounts.abs()
+    counterparty_ibans = df["Tegenrekening IBAN/BBAN"].where(df["Tegenrekening IBAN/BBAN"].notna(), None)
+    counterparty_names = df["Naam tegenpartij"].where(df["Naam tegenpartij"].notna(), None)
+    desc_parts = [df[f"Omschrijving-{i}"].fillna("") for i in range(1, 4)]
+    descriptions = _join_non_empty(_join_non_empty(desc_parts[0], desc_parts[1]), desc_parts[2]).str.strip()
+    descriptions = descriptions.where(descriptions != "", None)
+
+    ids = pd.Series(
+        Transaction.generate_ids(dates, amounts, counterparty_ibans, counterparty_names, descriptions),
+        index=df.index,
+        dtype=object,
+    )
+    duplicated = ids.duplicated()
+    for transaction_id in ids[duplicated]:
+        logging.warning(f"Skipping duplicate transaction in file (ID: {transaction_id[:8]}...)")
+
+    transactions = pd.DataFrame({
+        "id": ids,
+        "account_id": df["IBAN/BBAN"],
+        "transaction_date": dates,
+        "amount": amounts,
+        "currency": df["Munt"],
+        "counterparty_name": counterparty_names,
+        "counterparty_iban": counterparty_ibans,
+        "description_raw": descriptions,
+        "mutation_type": mutation_types,
+        "bank_source": "Rabobank",
+    })[~duplicated]
+    records = transactions.to_dict("records")
+    skipped_rows = int(missing.sum() + invalid.sum() + duplicated.sum())
 
     try:
+        # Transactions already in the database are skipped by the conflict clause on the
+        # primary key, so existing rows (and their categories) are left as they were.
+        # Inserted through the table rather than the mapped class, so all records go to
+        # the database in a single executemany().
+        new_count = 0
+        if records:
+            new_count = db.execute(
+                sqlite_insert(models.Transaction.__table__).on_conflict_do_nothing(index_elements=["id"]),
+                records,
+            ).rowcount
         db.commit()
-        logging.info(f"Successfully synced {transactions_processed} transactions from {filepath} to the database.")
+        logging.info(
+            f"Successfully synced {len(records)} transactions from {filepath} to the database "
+            f"({new_count} new, {len(records) - new_count} already present)."
+        )
     except Exception as e:
         db.rollback()
         logging.error(f"Failed to commit transactions to DB: {e}")
@@ -119,7 +182,7 @@ def import_budget_categories(db: Session, filepath: str):
     Imports budget category structure from a YNAB-like CSV export and persists to the DB.
     """
     try:
-        df = pd.read_csv(filepath, encoding="utf-8-sig", dtype=str)
+        df = _read_csv_columns(filepath, "utf-8-sig", ["Category Group", "Category"])
     except FileNotFoundError:
         logging.error(f"File not found: {filepath}")
         return
@@ -127,37 +190,39 @@ def import_budget_categories(db: Session, filepath: str):
         logging.error(f"Failed to read CSV file {filepath}: {e}")
         return
 
-    df.dropna(subset=["Category Group", "Category"], inplace=True)
-    df = df[df["Category Group"].str.strip() != ""]
-
-    category_map = {}
-    for _, row in df.iterrows():
-        group = _clean_str(row["Category Group"])
-        subcategory = _clean_str(row["Category"])
-        if group and group not in category_map:
-            category_map[group] = set()
-        if group and subcategory:
-            category_map[group].add(subcategory)
-
-    for cat_name, sub_names in category_map.items():
-        category_orm = db.query(models.Category).filter(models.Category.name == cat_name).first()
-        if not category_orm:
-            category_orm = models.Category(name=cat_name)
-            db.add(category_orm)
-            db.flush()
-
-        for sub_name in sub_names:
-            subcategory_orm = (
-                db.query(models.Subcategory)
-                .filter(models.Subcategory.name == sub_name, models.Subcategory.category_id == category_orm.id)
-                .first()
-            )
-            if not subcategory_orm:
-                db.add(models.Subcategory(name=sub_name, category_id=category_orm.id))
+    # One row per distinct (group, subcategory) pair, in order of first appearance
+    df = df.dropna(subset=["Category Group", "Category"])
+    pairs = df[["Category Group", "Category"]].apply(lambda column: column.str.strip())
+    pairs = pairs[pairs["Category Group"] != ""].drop_duplicates()
+
+    category_names = pairs["Category Group"].unique().tolist()
+    if not category_names:
+        logging.warning(f"No budget categories found in {filepath}.")
+        return
+
+    # Categories and subcategories that already exist are left alone by the conflict clauses
+    db.execute(
+        sqlite_insert(models.Category).on_conflict_do_nothing(index_elements=["name"]),
+        [{"name": cat_name} for cat_name in category_names],
+    )
+    category_ids = dict(
+        db.query(models.Category.name, models.Category.id).filter(models.Category.name.in_(category_names))
+    )
+
+    subcategories = pairs[pairs["Category"] != ""]
+    subcategory_rows = [
+        {"name": sub_name, "category_id": category_ids[cat_name]}
+        for cat_name, sub_name in zip(subcategories["Category Group"], subcategories["Category"])
+    ]
+    if subcategory_rows:
+        db.execute(
+            sqlite_insert(models.Subcategory).on_conflict_do_nothing(index_elements=["name", "category_id"]),
+            subcategory_rows,
+        )
 
     try:
         db.commit()
-        logging.info(f"Successfully synced {len(category_map)} budget categories from {filepath}.")
+        logging.info(f"Successfully synced {len(category_names)} budget categories from {filepath}.")
     except Exception as e:
         db.rollback()
         logging.error(f"Failed to commit budget categories to DB: {e}")
@@ -1,25 +1,59 @@
 from decimal import Decimal
 from sqlalchemy import (
+    DDL,
     Column,
     Date,
     ForeignKey,
+    Index,
     Integer,
     Numeric,
     String,
     TEXT,
     UniqueConstraint,
+    column,
+    event,
+    table,
+    text,
 )
 from sqlalchemy.orm import declarative_base, relationship
 
+from finanseer.text_processing import normalize_description
+
 Base = declarative_base()
 
 
+def _normalized_description(description_raw):
+    """
+    Derives the value of `description_normalized` from a raw description. A description
+    that normalizes to nothing (e.g. only stopwords) is stored as '', so that it still
+    counts as present when matching rules; only a missing or empty one is None.
+    """
+    return normalize_description(description_raw) if description_raw else None
+
+
+def _default_description_normalized(context):
+    """Column default that derives the normalized description from the raw one on insert."""
+    return _normalized_description(context.get_current_parameters().get("description_raw"))
+
+
+def _lowercase_counterparty_name(counterparty_name):
+    """Derives the value of `counterparty_name_lower`, lowercased in Python so non-ASCII letters are too."""
+    return counterparty_name.lower() if counterparty_name else None
+
+
+def _default_counterparty_name_lower(context):
+    """Column default that stores the lowercased counterparty name on insert."""
+    return _lowercase_counterparty_name(context.get_current_parameters().get("counterparty_name"))
+
+
 class Category(Base):
     __tablename__ = "categories"
     id = Column(Integer, primary_key=True)
     name = Column(String, unique=True, nullable=False)
 
-    subcategories = relationship("Subcategory", back_populates="category", cascade="all, delete-orphan")
+    subcategories = relationship(
+        "Subcategory", back_populates="category", cascade="all, delete-orphan", order_by="Subcategory.name"
+    )
 
 
 class Subcategory(Base):
@@ -42,8 +76,14 @@ class Transaction(Base):
     amount = Column(Numeric(10, 2), nullable=False, index=True)
     currency = Column(String(3), nullable=False)
     counterparty_name = Column(String)
+    counterparty_name_lower = Column(
+        String, default=_default_counterparty_name_lower, doc="counterparty_name in lowercase, for rule matching"
+    )
     counterparty_iban = Column(String, index=True)
     description_raw = Column(TEXT)
+    description_normalized = Column(
+        TEXT, default=_default_description_normalized, doc="description_raw after normalize_description"
+    )
     mutation_type = Column(String, nullable=False)
     bank_source = Column(String, nullable=False)
 
@@ -51,6 +91,92 @@ class Transaction(Base):
     subcategory = relationship("Subcategory", back_populates="transactions")
     # merchant_id = Column(Integer, ForeignKey('merchants.id'), nullable=True, index=True)
 
+    # Serve the review queue (uncategorized, sorted by date or amount) from an index scan.
+    # Partial indexes, so they only hold the uncategorized transactions.
+    __table_args__ = (
+        Index(
+            "ix_transactions_uncategorized_date",
+            "transaction_date",
+            sqlite_where=text("subcategory_id IS NULL"),
+            postgresql_where=text("subcategory_id IS NULL"),
+        ),
+        Index(
+            "ix_transactions_uncategorized_amount",
+            "amount",
+            sqlite_where=text("subcategory_id IS NULL"),
+            postgresql_where=text("subcategory_id IS NULL"),
+        ),
+        # Case-insensitive indexes, which SQLite uses for `LIKE 'prefix%'` searches
+        Index("ix_transactions_counterparty_name_nocase", text("counterparty_name COLLATE NOCASE")),
+        Index("ix_transactions_description_raw_nocase", text("description_raw COLLATE NOCASE")),
+    )
+
+
+# Columns of `transactions` that are derived in Python from another column, as
+# {derived column: (source column, function of the source value)}. Their column
+# defaults fill them in on insert, the listeners below keep them in sync when the
+# source attribute is changed on a Transaction, and `db.init_db` adds and backfills
+# them on databases created before they existed.
+TRANSACTION_DERIVED_COLUMNS = {
+    "description_normalized": ("description_raw", _normalized_description),
+    "counterparty_name_lower": ("counterparty_name", _lowercase_counterparty_name),
+}
+
+
+def _derived_column_updater(derived_column, derive):
+    """Returns an attribute listener that recomputes `derived_column` from the new source value."""
+    def _update_derived_column(target, value, oldvalue, initiator):
+        setattr(target, derived_column, derive(value))
+    return _update_derived_column
+
+
+for _derived_column, (_source_column, _derive) in TRANSACTION_DERIVED_COLUMNS.items():
+    event.listen(getattr(Transaction, _source_column), "set", _derived_column_updater(_derived_column, _derive))
+
+
+# --- Full-text search index (SQLite only) ---
+# FTS5 table with the trigram tokenizer, so case-insensitive substring searches on
+# counterparty name and description are answered from an index instead of a LIKE scan.
+# It is an external content table: it only holds the index, keyed by the rowid of each
+# transaction, and reads the text itself from `transactions`. The triggers below keep
+# it in sync, removing an entry by rowid rather than scanning the index for it.
+# SQLite's VACUUM may renumber the rowids of `transactions`, as it has no INTEGER
+# PRIMARY KEY; refill the index afterwards with TRANSACTIONS_FTS_REBUILD.
+transactions_fts = table(
+    "transactions_fts",
+    column("rowid"),
+    column("counterparty_name"),
+    column("description_raw"),
+)
+
+TRANSACTIONS_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5("
+    "counterparty_name, description_raw, content='transactions', content_rowid='rowid', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions BEGIN "
+    "INSERT INTO transactions_fts (rowid, counterparty_name, description_raw) "
+    "VALUES (new.rowid, new.counterparty_name, new.description_raw); END",
+    "CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions BEGIN "
+    "INSERT INTO transactions_fts (transactions_fts, rowid, counterparty_name, description_raw) "
+    "VALUES ('delete', old.rowid, old.counterparty_name, old.description_raw); END",
+    "CREATE TRIGGER IF NOT EXISTS transactions_fts_update "
+    "AFTER UPDATE OF counterparty_name, description_raw ON transactions BEGIN "
+    "INSERT INTO transactions_fts (transactions_fts, rowid, counterparty_name, description_raw) "
+    "VALUES ('delete', old.rowid, old.counterparty_name, old.description_raw); "
+    "INSERT INTO transactions_fts (rowid, counterparty_name, description_raw) "
+    "VALUES (new.rowid, new.counterparty_name, new.description_raw); END",
+]
+
+# Indexes every row of `transactions` from scratch
+TRANSACTIONS_FTS_REBUILD = "INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')"
+
+for _statement in TRANSACTIONS_FTS_DDL:
+    event.listen(Transaction.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(
+    Transaction.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS transactions_fts").execute_if(dialect="sqlite"),
+)
+
 
 # --- Placeholder Tables for Future Epics ---
 
@@ -2,10 +2,12 @@ import hashlib
 from datetime import date
 from decimal import Decimal
 from enum import Enum
-from typing import Optional
+from typing import Iterable, List, Optional
 
 from pydantic import BaseModel, Field, field_validator
 
+_CENTS = Decimal("0.01")
+
 
 class MutationType(str, Enum):
     DEBIT = "debit"
@@ -30,30 +32,63 @@ class Transaction(BaseModel):
     @classmethod
     def amount_must_be_two_decimal_places(cls, v: Decimal) -> Decimal:
         """Ensure the amount is quantized to two decimal places."""
-        return v.quantize(Decimal("0.01"))
+        return v.quantize(_CENTS)
 
     @staticmethod
-    def generate_id(
+    def _id_key(
         transaction_date: date,
         amount: Decimal,
         counterparty_iban: Optional[str],
         counterparty_name: Optional[str],
         description: Optional[str],
-    ) -> str:
-        """
-        Generates a unique ID hash for deduplication purposes.
-        Based on date, amount, counterparty (IBAN or name), and raw description.
-        """
+    ) -> bytes:
+        """Builds the bytes that are hashed into a transaction ID."""
         # Use IBAN if available, otherwise name. Fallback to empty string.
         counterparty_id = counterparty_iban or counterparty_name or ""
 
         data_to_hash = (
             f"{transaction_date.isoformat()}"
-            f"{amount.quantize(Decimal('0.01'))}"
+            f"{amount.quantize(_CENTS)}"
             f"{counterparty_id.strip()}"
             f"{description.strip() if description else ''}"
         )
-        return hashlib.sha256(data_to_hash.encode("utf-8")).hexdigest()
+        return data_to_hash.encode("utf-8")
+
+    @staticmethod
+    def generate_id(
+        transaction_date: date,
+        amount: Decimal,
+        counterparty_iban: Optional[str],
+        counterparty_name: Optional[str],
+        description: Optional[str],
+    ) -> str:
+        """
+        Generates a unique ID hash for deduplication purposes.
+        Based on date, amount, counterparty (IBAN or name), and raw description.
+        """
+        return hashlib.sha256(
+            Transaction._id_key(transaction_date, amount, counterparty_iban, counterparty_name, description)
+        ).hexdigest()
+
+    @staticmethod
+    def generate_ids(
+        transaction_dates: Iterable[date],
+        amounts: Iterable[Decimal],
+        counterparty_ibans: Iterable[Optional[str]],
+        counterparty_names: Iterable[Optional[str]],
+        descriptions: Iterable[Optional[str]],
+    ) -> List[str]:
+        """
+        Generates the IDs of many transactions at once, given their fields as parallel
+        sequences. Equivalent to calling `generate_id` per transaction, without the
+        per-call overhead.
+        """
+        sha256 = hashlib.sha256
+        id_key = Transaction._id_key
+        return [
+            sha256(id_key(*fields)).hexdigest()
+            for fields in zip(transaction_dates, amounts, counterparty_ibans, counterparty_names, descriptions)
+        ]
 
 
 class BudgetCategory(BaseModel):
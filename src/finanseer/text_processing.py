@@ -1,8 +1,10 @@
 import re
+from functools import lru_cache
+
 from unidecode import unidecode
 
 # A list of common, uninformative tokens found in bank descriptions
-STOPWORDS = {
+STOPWORDS = frozenset({
     "abn", "amro", "ing", "rabo", "rabobank", "knab", "bunq",
     "betaling", "betaalautomaat", "sepa", "ideal", "europe", "bv",
     "via", "trn", "iban", "bic", "pasnr", "datum", "tijd", "kenmerk",
@@ -10,8 +12,21 @@ STOPWORDS = {
     "rabomobiel", "internetbankieren", "mobiel", "bankieren",
     "overboeking", "rekening", "naar", "van", "eo", "bij",
     "stichting", "payments", "online", "payment",
-}
+})
+
+# Transliterations of the accented Latin letters (Latin-1 Supplement and Latin
+# Extended-A), taken from unidecode, so common descriptions are converted to ASCII
+# by a single C-level str.translate instead of unidecode's per-character loop.
+_LATIN_TO_ASCII = str.maketrans({chr(code): unidecode(chr(code)) for code in range(0xC0, 0x180)})
 
+_NON_ALPHANUMERIC_RE = re.compile(r'[^a-z0-9\s]')
+_WHITESPACE_RE = re.compile(r'\s+')
+# Matches any stopword as a whole token. Longest first, so no stopword is cut short by a prefix.
+_STOPWORD_RE = re.compile(
+    r'\b(?:' + '|'.join(map(re.escape, sorted(STOPWORDS, key=len, reverse=True))) + r')\b'
+)
+
+@lru_cache(maxsize=16384)
 def normalize_description(text: str) -> str:
     """
     Normalizes a transaction description by:
@@ -21,6 +36,8 @@ def normalize_description(text: str) -> str:
     4. Removing common banking stopwords.
     5. Collapsing multiple spaces into one.
 
+    Results are cached, as recurring transactions often share the same description.
+
     Args:
         text: The raw description string.
 
@@ -30,18 +47,20 @@ def normalize_description(text: str) -> str:
     if not text:
         return ""
 
-    # 1. Lowercase and 2. Remove diacritics
-    text = unidecode(text.lower())
+    # 1. Lowercase and 2. Remove diacritics, leaving only rarer characters to unidecode
+    text = text.lower()
+    if not text.isascii():
+        text = text.translate(_LATIN_TO_ASCII)
+        if not text.isascii():
+            text = unidecode(text)
 
     # 3. Remove non-alphanumeric characters
-    text = re.sub(r'[^a-z0-9\s]', ' ', text)
+    text = _NON_ALPHANUMERIC_RE.sub(' ', text)
 
     # 4. Remove stopwords
-    tokens = text.split()
-    tokens = [token for token in tokens if token not in STOPWORDS]
-    text = " ".join(tokens)
+    text = _STOPWORD_RE.sub(' ', text)
 
     # 5. Collapse multiple spaces
-    text = re.sub(r'\s+', ' ', text).strip()
+    text = _WHITESPACE_RE.sub(' ', text).strip()
 
     return text
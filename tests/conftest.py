@@ -0,0 +1,135 @@
+import contextlib
+import re
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from finanseer.models import Base, Transaction, Category, Subcategory
+
+# In-memory SQLite database for testing
+TEST_DATABASE_URL = "sqlite://"
+
+
+def _create_test_engine():
+    """
+    Create an engine on a new in-memory database, with the schema in place. The
+    engine holds a single connection, so every session on it sees the same database.
+    """
+    engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+    # pysqlite starts and ends transactions on its own, which breaks SAVEPOINTs.
+    # Turn that off and let SQLAlchemy emit BEGIN itself.
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+    Base.metadata.create_all(engine)
+    return engine
+
+
+# Transaction control statements, which `count_queries` leaves out
+_TRANSACTION_CONTROL_RE = re.compile(r"(BEGIN|SAVEPOINT|RELEASE|ROLLBACK)\b", re.IGNORECASE)
+
+
+@contextlib.contextmanager
+def _count_queries(session):
+    """
+    Record the statements a session sends to the database inside the block,
+    leaving out BEGIN and SAVEPOINT handling.
+
+    Args:
+        session: The session to watch.
+
+    Yields:
+        The list the statements are appended to.
+    """
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if not _TRANSACTION_CONTROL_RE.match(statement):
+            statements.append(statement)
+
+    connection = session.connection()
+    event.listen(connection, "before_cursor_execute", _record)
+    try:
+        yield statements
+    finally:
+        event.remove(connection, "before_cursor_execute", _record)
+
+
+def _session_in_rolled_back_transaction(engine):
+    """
+    Yield a session inside a transaction that is rolled back afterwards. Commits
+    made with the session only release a SAVEPOINT, so nothing persists.
+    """
+    connection = engine.connect()
+    transaction = connection.begin()
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=connection, join_transaction_mode="create_savepoint")
+    session = Session()
+
+    yield session
+
+    session.close()
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture(scope="session")
+def engine():
+    """Create the test database engine and schema once for the whole test run."""
+    engine = _create_test_engine()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def seeded_engine():
+    """Create a second test database, populated once with reference data."""
+    engine = _create_test_engine()
+    today = date.today()
+    with Session(engine) as session:
+        session.bulk_insert_mappings(Category, [
+            {"id": 1, "name": "Bills"},
+            {"id": 2, "name": "Food"},
+        ])
+        session.bulk_insert_mappings(Subcategory, [
+            {"id": 1, "name": "Rent", "category_id": 1},
+            {"id": 2, "name": "Groceries", "category_id": 2},
+        ])
+        session.bulk_insert_mappings(Transaction, [
+            {"id": "t1", "account_id": "A1", "transaction_date": today, "amount": Decimal("10.00"), "currency": "EUR", "mutation_type": "debit", "bank_source": "TestBank", "subcategory_id": 1},
+            {"id": "t2", "account_id": "A1", "transaction_date": today - timedelta(days=1), "amount": Decimal("20.00"), "currency": "EUR", "mutation_type": "debit", "bank_source": "TestBank"},
+            {"id": "t3", "account_id": "A1", "transaction_date": today - timedelta(days=2), "amount": Decimal("30.00"), "currency": "EUR", "mutation_type": "debit", "bank_source": "TestBank"},
+        ])
+        session.commit()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="function")
+def db_session(engine):
+    """Create a database session on an empty database for a test."""
+    yield from _session_in_rolled_back_transaction(engine)
+
+
+@pytest.fixture(scope="function")
+def db_session_with_data(seeded_engine):
+    """
+    Create a database session for a test, on a database with two categories
+    (Bills: Rent, Food: Groceries) and three transactions, of which t1 is categorized.
+    """
+    yield from _session_in_rolled_back_transaction(seeded_engine)
+
+
+@pytest.fixture
+def count_queries():
+    """Provide a context manager that records the statements a session sends."""
+    return _count_queries
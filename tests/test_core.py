@@ -1,50 +1,19 @@
-from datetime import date, timedelta
+from datetime import date
 from decimal import Decimal
 
 import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 
-from finanseer.models import Base, Transaction, Category, Subcategory
-from finanseer.core import get_uncategorized_transactions, get_all_categories, set_category_for_transactions, get_transactions_by_text
+from finanseer import core
+from finanseer.models import Transaction, Category, Subcategory
+from finanseer.core import get_uncategorized_transactions, count_uncategorized_transactions, get_all_categories, set_category_for_transactions, get_transactions_by_text
 
 
-@pytest.fixture(scope="function")
-def db_session_with_data():
-    """Create a new in-memory DB session and populate it with test data."""
-    engine = create_engine("sqlite:///:memory:")
-    Base.metadata.create_all(engine)
-    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    session = Session()
-
-    # Create categories
-    cat_bills = Category(name="Bills")
-    cat_food = Category(name="Food")
-    session.add_all([cat_bills, cat_food])
-    session.commit()
-
-    sub_rent = Subcategory(name="Rent", category_id=cat_bills.id)
-    sub_groceries = Subcategory(name="Groceries", category_id=cat_food.id)
-    session.add_all([sub_rent, sub_groceries])
-    session.commit()
-
-    # Create transactions
-    today = date.today()
-    t1 = Transaction(id="t1", account_id="A1", transaction_date=today, amount=Decimal("10.00"), currency="EUR", mutation_type="debit", bank_source="TestBank", subcategory_id=sub_rent.id)
-    t2 = Transaction(id="t2", account_id="A1", transaction_date=today - timedelta(days=1), amount=Decimal("20.00"), currency="EUR", mutation_type="debit", bank_source="TestBank")
-    t3 = Transaction(id="t3", account_id="A1", transaction_date=today - timedelta(days=2), amount=Decimal("30.00"), currency="EUR", mutation_type="debit", bank_source="TestBank")
-    session.add_all([t1, t2, t3])
-    session.commit()
-
-    yield session
-
-    session.close()
-    Base.metadata.drop_all(engine)
-
-def test_get_uncategorized_transactions(db_session_with_data):
+def test_get_uncategorized_transactions(db_session_with_data, count_queries):
     """Test that only transactions without a category are returned."""
-    uncategorized = get_uncategorized_transactions(db_session_with_data)
+    with count_queries(db_session_with_data) as queries:
+        uncategorized = get_uncategorized_transactions(db_session_with_data)
 
+    assert len(queries) == 1
     assert len(uncategorized) == 2
     assert uncategorized[0].id == "t2" # Most recent
     assert uncategorized[1].id == "t3"
@@ -58,6 +27,15 @@ def test_get_uncategorized_transactions_sorted_by_amount(db_session_with_data):
     assert uncategorized[0].id == "t3" # 30.00 is the highest amount
     assert uncategorized[1].id == "t2" # 20.00 is the second highest
 
+def test_get_uncategorized_transactions_paginated(db_session_with_data):
+    """Test that limit and offset return a single page, while the count covers all rows."""
+    first_page = get_uncategorized_transactions(db_session_with_data, limit=1)
+    second_page = get_uncategorized_transactions(db_session_with_data, limit=1, offset=1)
+
+    assert [t.id for t in first_page] == ["t2"]
+    assert [t.id for t in second_page] == ["t3"]
+    assert count_uncategorized_transactions(db_session_with_data) == 2
+
 def test_get_transactions_by_text(db_session_with_data):
     """Test finding transactions by a text pattern."""
     # Add more specific test data
@@ -79,10 +57,78 @@ def test_get_transactions_by_text(db_session_with_data):
     results_none = get_transactions_by_text(db_session_with_data, "nonexistent")
     assert len(results_none) == 0
 
-def test_get_all_categories(db_session_with_data):
+    # Test that a blank pattern matches nothing, rather than everything
+    assert get_transactions_by_text(db_session_with_data, "") == []
+    assert get_transactions_by_text(db_session_with_data, "  ") == []
+
+def test_get_transactions_by_text_substring(db_session_with_data):
+    """Test that searches match inside words, including short patterns and edited rows."""
+    t4 = Transaction(id="t4", account_id="A1", transaction_date=date.today(), amount=Decimal("15.00"), currency="EUR", mutation_type="debit", bank_source="TestBank", counterparty_name="Albert Heijn 1234")
+    db_session_with_data.add(t4)
+    db_session_with_data.commit()
+
+    assert [t.id for t in get_transactions_by_text(db_session_with_data, "HEIJN")] == ["t4"]
+    assert [t.id for t in get_transactions_by_text(db_session_with_data, "ij")] == ["t4"]
+
+    # The search index follows updates to the searchable columns
+    t4.counterparty_name = "Jumbo"
+    db_session_with_data.commit()
+    assert get_transactions_by_text(db_session_with_data, "heijn") == []
+    assert [t.id for t in get_transactions_by_text(db_session_with_data, "umb")] == ["t4"]
+
+def test_get_transactions_by_text_match_modes(db_session_with_data):
+    """Test prefix and suffix searches, including patterns with LIKE wildcards."""
+    t4 = Transaction(id="t4", account_id="A1", transaction_date=date.today(), amount=Decimal("15.00"), currency="EUR", mutation_type="debit", bank_source="TestBank", counterparty_name="Albert Heijn 1234")
+    t5 = Transaction(id="t5", account_id="A1", transaction_date=date.today(), amount=Decimal("15.00"), currency="EUR", mutation_type="debit", bank_source="TestBank", description_raw="Betaling 100% korting")
+    db_session_with_data.add_all([t4, t5])
+    db_session_with_data.commit()
+
+    assert [t.id for t in get_transactions_by_text(db_session_with_data, "albert", match_mode="prefix")] == ["t4"]
+    assert get_transactions_by_text(db_session_with_data, "heijn", match_mode="prefix") == []
+    assert [t.id for t in get_transactions_by_text(db_session_with_data, "HEIJN 1234", match_mode="suffix")] == ["t4"]
+    assert get_transactions_by_text(db_session_with_data, "albert", match_mode="suffix") == []
+    assert [t.id for t in get_transactions_by_text(db_session_with_data, "betaling 100%", match_mode="prefix")] == ["t5"]
+    assert get_transactions_by_text(db_session_with_data, "betaling 1_0", match_mode="prefix") == []
+
+    with pytest.raises(ValueError):
+        get_transactions_by_text(db_session_with_data, "albert", match_mode="regex")
+
+def test_get_transactions_by_text_short_wildcards(db_session_with_data):
+    """Test that LIKE wildcards in short contains patterns are matched literally."""
+    db_session_with_data.add_all([
+        Transaction(id="t4", account_id="A1", transaction_date=date.today(), amount=Decimal("15.00"), currency="EUR", mutation_type="debit", bank_source="TestBank", counterparty_name="Albert Heijn 1234"),
+        Transaction(id="t5", account_id="A1", transaction_date=date.today(), amount=Decimal("15.00"), currency="EUR", mutation_type="debit", bank_source="TestBank", description_raw="Betaling 100% korting"),
+        Transaction(id="t6", account_id="A1", transaction_date=date.today(), amount=Decimal("15.00"), currency="EUR", mutation_type="debit", bank_source="TestBank", counterparty_name="Bol_com"),
+    ])
+    db_session_with_data.commit()
+
+    assert [t.id for t in get_transactions_by_text(db_session_with_data, "%")] == ["t5"]
+    assert [t.id for t in get_transactions_by_text(db_session_with_data, "_")] == ["t6"]
+    assert [t.id for t in get_transactions_by_text(db_session_with_data, "l_")] == ["t6"]
+    assert get_transactions_by_text(db_session_with_data, "/") == []
+
+def test_get_transactions_by_text_follows_edits_and_deletes(db_session):
+    """Test that the full-text index is kept in sync when transactions are edited or deleted."""
+    db_session.add_all([
+        Transaction(id="t_edit", account_id="A1", transaction_date=date.today(), amount=Decimal("5.00"), currency="EUR", description_raw="Albert Heijn 1234", mutation_type="debit", bank_source="Test"),
+        Transaction(id="t_delete", account_id="A1", transaction_date=date.today(), amount=Decimal("6.00"), currency="EUR", description_raw="Albert Heijn 5678", mutation_type="debit", bank_source="Test"),
+    ])
+    db_session.commit()
+
+    db_session.get(Transaction, "t_edit").description_raw = "Jumbo Utrecht"
+    db_session.delete(db_session.get(Transaction, "t_delete"))
+    db_session.commit()
+
+    assert get_transactions_by_text(db_session, "albert") == []
+    assert [t.id for t in get_transactions_by_text(db_session, "jumbo")] == ["t_edit"]
+
+def test_get_all_categories(db_session_with_data, count_queries):
     """Test fetching all categories and their subcategories."""
-    categories = get_all_categories(db_session_with_data)
+    with count_queries(db_session_with_data) as queries:
+        categories = get_all_categories(db_session_with_data)
 
+    # One query for the categories and one for all of their subcategories
+    assert len(queries) == 2
     assert len(categories) == 2
     bills = next(c for c in categories if c.name == "Bills")
     food = next(c for c in categories if c.name == "Food")
@@ -92,81 +138,151 @@ def test_get_all_categories(db_session_with_data):
     assert len(food.subcategories) == 1
     assert food.subcategories[0].name == "Groceries"
 
-from finanseer.models import Rule
-from finanseer.schemas import RuleType
-from finanseer.core import apply_rules
+def test_set_category_for_transactions_in_batches(db_session_with_data, monkeypatch):
+    """Test that all transactions are updated when the IDs span several batches."""
+    monkeypatch.setattr(core, "UPDATE_BATCH_SIZE", 1)
+    sub_groceries = db_session_with_data.query(Subcategory).filter(Subcategory.name == "Groceries").one()
 
-def test_apply_rules_iban(db_session_with_data):
-    """Test that a transaction is categorized by an IBAN rule."""
-    session = db_session_with_data
-    # Add a transaction with a specific IBAN
-    t_iban = Transaction(id="t_iban", account_id="A1", transaction_date=date.today(), amount=Decimal("50.00"), currency="EUR", counterparty_iban="NL66INGB0001234567", mutation_type="debit", bank_source="Test")
-    session.add(t_iban)
-    # Get a subcategory to assign
-    sub_rent = session.query(Subcategory).filter(Subcategory.name == "Rent").one()
-    # Create the rule
-    rule = Rule(type=RuleType.IBAN.value, pattern="NL66INGB0001234567", subcategory_id=sub_rent.id, priority=10)
-    session.add(rule)
-    session.commit()
+    updated = set_category_for_transactions(db_session_with_data, ["t2", "t3"], sub_groceries.id)
 
-    # Apply rules
-    count = apply_rules(session)
-    assert count == 1
+    assert updated == 2
+    db_session_with_data.expire_all()
+    assert get_uncategorized_transactions(db_session_with_data) == []
+    t2 = db_session_with_data.query(Transaction).filter(Transaction.id == "t2").one()
+    assert t2.subcategory_id == sub_groceries.id
 
-    # Verify the transaction is categorized
-    t_iban_updated = session.query(Transaction).filter(Transaction.id == "t_iban").one()
-    assert t_iban_updated.subcategory_id == sub_rent.id
+def test_set_category_for_transactions_skips_unchanged(db_session_with_data):
+    """Test that transactions already in the target subcategory, or unknown IDs, are not updated."""
+    sub_rent = db_session_with_data.query(Subcategory).filter(Subcategory.name == "Rent").one()
 
-def test_apply_rules_counterparty_name(db_session_with_data):
-    """Test categorization by a counterparty name rule."""
-    session = db_session_with_data
-    t_cp = Transaction(id="t_cp", account_id="A1", transaction_date=date.today(), amount=Decimal("75.00"), currency="EUR", counterparty_name="CoolBlue BV", mutation_type="debit", bank_source="Test")
-    session.add(t_cp)
-    sub_groceries = session.query(Subcategory).filter(Subcategory.name == "Groceries").one()
-    rule = Rule(type=RuleType.COUNTERPARTY_NAME.value, pattern="coolblue", subcategory_id=sub_groceries.id, priority=10)
-    session.add(rule)
-    session.commit()
+    # t1 is already categorized as Rent
+    updated = set_category_for_transactions(db_session_with_data, ["t1", "t2", "missing"], sub_rent.id)
+    assert updated == 1
 
-    count = apply_rules(session)
-    assert count == 1
-    t_cp_updated = session.query(Transaction).filter(Transaction.id == "t_cp").one()
-    assert t_cp_updated.subcategory_id == sub_groceries.id
+    assert set_category_for_transactions(db_session_with_data, ["t1", "t2"], sub_rent.id) == 0
+
+def test_get_all_categories_sorts_subcategories(db_session_with_data):
+    """Test that subcategories are returned sorted by name."""
+    bills = db_session_with_data.query(Category).filter(Category.name == "Bills").one()
+    db_session_with_data.add_all([Subcategory(name="Water", category_id=bills.id), Subcategory(name="Energy", category_id=bills.id)])
+    db_session_with_data.commit()
+    db_session_with_data.expire_all()
+
+    categories = get_all_categories(db_session_with_data)
+
+    bills = next(c for c in categories if c.name == "Bills")
+    assert [s.name for s in bills.subcategories] == ["Energy", "Rent", "Water"]
+
+from finanseer.models import Rule
+from finanseer.schemas import RuleType
+from finanseer.core import apply_rules
 
-def test_apply_rules_description_contains(db_session_with_data):
-    """Test categorization by a description contains rule."""
+# Cases of a single transaction and the rules applied to it: the transaction's matched
+# fields, the rules as (type, pattern, subcategory name, priority), and the name of the
+# subcategory the transaction should end up in, or None if no rule matches.
+APPLY_RULES_CASES = [
+    pytest.param(
+        {"counterparty_iban": "NL66INGB0001234567"},
+        [(RuleType.IBAN, "NL66INGB0001234567", "Rent", 10)],
+        "Rent",
+        id="iban",
+    ),
+    pytest.param(
+        {"counterparty_name": "CoolBlue BV"},
+        [(RuleType.COUNTERPARTY_NAME, "coolblue", "Groceries", 10)],
+        "Groceries",
+        id="counterparty_name",
+    ),
+    # Case is ignored beyond ASCII letters too
+    pytest.param(
+        {"counterparty_name": "CAFÉ DE ÉÉNHOORN"},
+        [(RuleType.COUNTERPARTY_NAME, "Café de Éénhoorn", "Groceries", 10)],
+        "Groceries",
+        id="counterparty_name_non_ascii",
+    ),
+    pytest.param(
+        {"description_raw": "Online payment to Amazon.com"},
+        [(RuleType.DESCRIPTION_CONTAINS, "amazon", "Groceries", 10)],
+        "Groceries",
+        id="description_contains",
+    ),
+    # The higher priority rule (lower number) wins
+    pytest.param(
+        {"counterparty_name": "Albert Heijn"},
+        [
+            (RuleType.COUNTERPARTY_NAME, "albert heijn", "Rent", 100),
+            (RuleType.COUNTERPARTY_NAME, "albert heijn", "Groceries", 10),
+        ],
+        "Groceries",
+        id="priority",
+    ),
+    # Priority decides between a matching name rule and a matching description rule
+    pytest.param(
+        {"counterparty_name": "Bol.com", "description_raw": "Order 1234 rent deposit"},
+        [
+            (RuleType.COUNTERPARTY_NAME, "bol.com", "Groceries", 50),
+            (RuleType.DESCRIPTION_CONTAINS, "rent deposit", "Rent", 10),
+        ],
+        "Rent",
+        id="priority_across_rule_types",
+    ),
+    # A description of only stopwords normalizes to '', which an empty pattern still matches
+    pytest.param(
+        {"description_raw": "Betaling via iDEAL"},
+        [(RuleType.DESCRIPTION_CONTAINS, "", "Groceries", 10)],
+        "Groceries",
+        id="description_contains_empty_pattern",
+    ),
+    pytest.param(
+        {"counterparty_iban": "NL66INGB0001234567"},
+        [(RuleType.IBAN, "NON_EXISTENT_IBAN", "Rent", 10)],
+        None,
+        id="no_match",
+    ),
+]
+
+@pytest.mark.parametrize("transaction_fields, rules, expected_subcategory", APPLY_RULES_CASES)
+def test_apply_rules(db_session_with_data, count_queries, transaction_fields, rules, expected_subcategory):
+    """Test that apply_rules assigns the subcategory of the highest priority matching rule."""
     session = db_session_with_data
-    t_desc = Transaction(id="t_desc", account_id="A1", transaction_date=date.today(), amount=Decimal("80.00"), currency="EUR", description_raw="Online payment to Amazon.com", mutation_type="debit", bank_source="Test")
-    session.add(t_desc)
-    sub_groceries = session.query(Subcategory).filter(Subcategory.name == "Groceries").one()
-    rule = Rule(type=RuleType.DESCRIPTION_CONTAINS.value, pattern="amazon", subcategory_id=sub_groceries.id, priority=10)
-    session.add(rule)
+    session.add(Transaction(id="t_rule", account_id="A1", transaction_date=date.today(), amount=Decimal("50.00"), currency="EUR", mutation_type="debit", bank_source="Test", **transaction_fields))
+    subcategory_ids = dict(session.query(Subcategory.name, Subcategory.id))
+    session.add_all([
+        Rule(type=rule_type.value, pattern=pattern, subcategory_id=subcategory_ids[subcategory], priority=priority)
+        for rule_type, pattern, subcategory, priority in rules
+    ])
     session.commit()
 
-    count = apply_rules(session)
-    assert count == 1
-    t_desc_updated = session.query(Transaction).filter(Transaction.id == "t_desc").one()
-    assert t_desc_updated.subcategory_id == sub_groceries.id
+    with count_queries(session) as queries:
+        count = apply_rules(session)
+    # SELECTs of the rules and of the uncategorized transactions, and one UPDATE per matched subcategory
+    assert len(queries) == (3 if expected_subcategory else 2)
+    assert count == (1 if expected_subcategory else 0)
+
+    expected_id = subcategory_ids[expected_subcategory] if expected_subcategory else None
+    assert session.query(Transaction).filter(Transaction.id == "t_rule").one().subcategory_id == expected_id
+    # The seeded uncategorized transactions match none of the rules
+    assert session.get(Transaction, "t2").subcategory_id is None
 
-def test_apply_rules_priority(db_session_with_data):
-    """Test that a higher priority rule (lower number) is chosen over a lower priority one."""
+def test_apply_rules_description_priority(db_session_with_data):
+    """Test that overlapping description rules are resolved by priority, not by where they match."""
     session = db_session_with_data
-    t_priority = Transaction(id="t_prio", account_id="A1", transaction_date=date.today(), amount=Decimal("100.00"), currency="EUR", counterparty_name="Albert Heijn", mutation_type="debit", bank_source="Test")
-    session.add(t_priority)
+    t_first = Transaction(id="t_first", account_id="A1", transaction_date=date.today(), amount=Decimal("4.50"), currency="EUR", description_raw="Coffee at Utrecht Centraal station", mutation_type="debit", bank_source="Test")
+    t_second = Transaction(id="t_second", account_id="A1", transaction_date=date.today(), amount=Decimal("4.50"), currency="EUR", description_raw="Coffee to go", mutation_type="debit", bank_source="Test")
+    session.add_all([t_first, t_second])
 
     sub_rent = session.query(Subcategory).filter(Subcategory.name == "Rent").one()
     sub_groceries = session.query(Subcategory).filter(Subcategory.name == "Groceries").one()
-
-    # Conflicting rules
-    rule_low_prio = Rule(type=RuleType.COUNTERPARTY_NAME.value, pattern="albert heijn", subcategory_id=sub_rent.id, priority=100)
-    rule_high_prio = Rule(type=RuleType.COUNTERPARTY_NAME.value, pattern="albert heijn", subcategory_id=sub_groceries.id, priority=10)
-    session.add_all([rule_low_prio, rule_high_prio])
+    session.add_all([
+        Rule(type=RuleType.DESCRIPTION_CONTAINS.value, pattern="coffee", subcategory_id=sub_groceries.id, priority=100),
+        Rule(type=RuleType.DESCRIPTION_CONTAINS.value, pattern="centraal station", subcategory_id=sub_rent.id, priority=10),
+    ])
     session.commit()
 
     count = apply_rules(session)
-    assert count == 1
-    t_prio_updated = session.query(Transaction).filter(Transaction.id == "t_prio").one()
-    # Should be categorized as Groceries due to higher priority
-    assert t_prio_updated.subcategory_id == sub_groceries.id
+    assert count == 2
+    assert session.get(Transaction, "t_first").subcategory_id == sub_rent.id
+    assert session.get(Transaction, "t_second").subcategory_id == sub_groceries.id
 
 def test_apply_rules_dry_run(db_session_with_data):
     """Test that dry_run simulates changes without committing them."""
@@ -187,22 +303,46 @@ def test_apply_rules_dry_run(db_session_with_data):
     t_dry_updated = session.query(Transaction).filter(Transaction.id == "t_dry").one()
     assert t_dry_updated.subcategory_id is None
 
-def test_apply_rules_no_match(db_session_with_data):
-    """Test that no changes are made if no rules match."""
+def test_match_rules_automaton_matches_regex(db_session_with_data, monkeypatch):
+    """Test that the Aho-Corasick and regular expression matchers pick the same rules."""
+    pytest.importorskip("ahocorasick")
     session = db_session_with_data
-    # Use one of the existing uncategorized transactions
-    t2 = session.query(Transaction).filter(Transaction.id == "t2").one()
-    assert t2.subcategory_id is None
-
-    # Add a rule that won't match
-    sub_rent = session.query(Subcategory).filter(Subcategory.name == "Rent").one()
-    rule = Rule(type=RuleType.IBAN.value, pattern="NON_EXISTENT_IBAN", subcategory_id=sub_rent.id, priority=10)
-    session.add(rule)
+    session.add_all([
+        Transaction(id=f"t_match{i}", account_id="A1", transaction_date=date.today(), amount=Decimal("5.00"), currency="EUR", mutation_type="debit", bank_source="Test", **fields)
+        for i, fields in enumerate([
+            {"counterparty_name": "Albert Heijn 1234", "description_raw": "Coffee at Utrecht Centraal station"},
+            {"counterparty_name": "AH to go", "description_raw": "Coffee to go"},
+            {"counterparty_name": "CAFÉ DE ÉÉNHOORN"},
+            {"description_raw": "Pinbetaling"},
+            {"counterparty_iban": "NL66INGB0001234567"},
+        ])
+    ])
+    # Overlapping patterns, a repeated pattern and an empty catch-all pattern, at mixed priorities
+    session.add_all([
+        Rule(type=rule_type.value, pattern=pattern, subcategory_id=subcategory_id, priority=priority)
+        for rule_type, pattern, subcategory_id, priority in [
+            (RuleType.COUNTERPARTY_NAME, "heijn", 2, 30),
+            (RuleType.COUNTERPARTY_NAME, "albert heijn", 1, 40),
+            (RuleType.COUNTERPARTY_NAME, "éénhoorn", 2, 20),
+            (RuleType.COUNTERPARTY_NAME, "Éénhoorn", 1, 10),
+            (RuleType.DESCRIPTION_CONTAINS, "coffee", 2, 50),
+            (RuleType.DESCRIPTION_CONTAINS, "centraal station", 1, 25),
+            (RuleType.DESCRIPTION_CONTAINS, "to go", 1, 60),
+            (RuleType.DESCRIPTION_CONTAINS, "", 1, 90),
+        ]
+    ])
     session.commit()
-
-    count = apply_rules(session)
-    assert count == 0
-
-    # Verify the transaction is still uncategorized
-    t2_updated = session.query(Transaction).filter(Transaction.id == "t2").one()
-    assert t2_updated.subcategory_id is None
+    rules = session.query(Rule).order_by(Rule.priority, Rule.id).all()
+    pattern_ids = {rule.pattern: rule.id for rule in rules}
+
+    automaton_matches = core._match_rules(session, rules)
+    monkeypatch.setattr(core, "ahocorasick", None)
+    regex_matches = core._match_rules(session, rules)
+
+    assert automaton_matches == regex_matches
+    assert automaton_matches == {
+        pattern_ids["Éénhoorn"]: ["t_match2"],
+        pattern_ids["centraal station"]: ["t_match0"],
+        pattern_ids["coffee"]: ["t_match1"],
+        pattern_ids[""]: ["t_match3"],
+    }
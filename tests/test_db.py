@@ -0,0 +1,143 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from finanseer.core import apply_rules, get_transactions_by_text
+from finanseer.db import init_db
+from finanseer.models import Category, Rule, Subcategory, Transaction
+from finanseer.schemas import RuleType
+
+# The `transactions` table as created by the first release, before any column was added
+BASELINE_TRANSACTIONS_DDL = """
+CREATE TABLE transactions (
+    id VARCHAR(64) NOT NULL,
+    account_id VARCHAR NOT NULL,
+    transaction_date DATE NOT NULL,
+    amount NUMERIC(10, 2) NOT NULL,
+    currency VARCHAR(3) NOT NULL,
+    counterparty_name VARCHAR,
+    counterparty_iban VARCHAR,
+    description_raw TEXT,
+    mutation_type VARCHAR NOT NULL,
+    bank_source VARCHAR NOT NULL,
+    subcategory_id INTEGER,
+    PRIMARY KEY (id)
+)
+"""
+
+BASELINE_TRANSACTIONS = [
+    ("t1", "A1", "2024-01-01", 10.5, "EUR", "CAFÉ DE ÉÉNHOORN", None, "Betaling via iDEAL bij Café 't Hoekje", "debit", "TestBank", 1),
+    ("t2", "A1", "2024-01-02", 20.0, "EUR", None, "NL02RABO0987654321", None, "debit", "TestBank", None),
+    ("t3", "A1", "2024-01-03", 32.1, "EUR", "Albert Heijn 1234", None, "Boodschappen", "debit", "TestBank", None),
+]
+
+
+def _create_baseline_database(tmp_path):
+    """Creates a database file with a baseline `transactions` table holding three transactions."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'finanseer.db'}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql(BASELINE_TRANSACTIONS_DDL)
+        connection.exec_driver_sql(
+            "INSERT INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", BASELINE_TRANSACTIONS
+        )
+    return engine
+
+
+def test_init_db_upgrades_baseline_database(tmp_path):
+    # GIVEN a database created before the derived columns existed
+    engine = _create_baseline_database(tmp_path)
+
+    # WHEN initializing it
+    init_db(engine)
+
+    # THEN the derived columns are added and filled in, keeping existing categorizations
+    with Session(engine) as session:
+        t1, t2 = session.get(Transaction, "t1"), session.get(Transaction, "t2")
+        assert (t1.description_normalized, t1.counterparty_name_lower, t1.subcategory_id) == ("cafe t hoekje", "café de éénhoorn", 1)
+        assert (t2.description_normalized, t2.counterparty_name_lower, t2.subcategory_id) == (None, None, None)
+    engine.dispose()
+
+
+def test_init_db_creates_missing_indexes(tmp_path):
+    # GIVEN a database created before the review-queue and case-insensitive indexes existed
+    engine = _create_baseline_database(tmp_path)
+
+    # WHEN initializing it
+    init_db(engine)
+
+    # THEN every index of the current schema is present
+    with engine.connect() as connection:
+        index_names = {row[0] for row in connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {index.name for index in Transaction.__table__.indexes} <= index_names
+    assert "ix_transactions_uncategorized_date" in index_names
+    assert "ix_transactions_counterparty_name_nocase" in index_names
+    engine.dispose()
+
+
+def test_init_db_is_idempotent(tmp_path):
+    # GIVEN a baseline database that has already been upgraded
+    engine = _create_baseline_database(tmp_path)
+    init_db(engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "UPDATE transactions SET description_normalized = 'edited', counterparty_name_lower = 'edited' WHERE id = 't1'"
+        )
+
+    # WHEN initializing it again
+    init_db(engine)
+
+    # THEN the stored values are left as they were
+    with Session(engine) as session:
+        t1 = session.get(Transaction, "t1")
+        assert (t1.description_normalized, t1.counterparty_name_lower) == ("edited", "edited")
+    engine.dispose()
+
+
+def test_init_db_fills_in_empty_normalized_descriptions(tmp_path):
+    # GIVEN an upgraded database in which a description of only stopwords was stored as NULL
+    engine = _create_baseline_database(tmp_path)
+    init_db(engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("UPDATE transactions SET description_raw = 'Betaling via iDEAL', description_normalized = NULL WHERE id = 't3'")
+
+    # WHEN initializing it again
+    init_db(engine)
+
+    # THEN the description is stored as normalizing to '', and a missing one is left as NULL
+    with Session(engine) as session:
+        assert session.get(Transaction, "t3").description_normalized == ""
+        assert session.get(Transaction, "t2").description_normalized is None
+    engine.dispose()
+
+
+def test_upgraded_database_matches_counterparty_rules(tmp_path):
+    # GIVEN an upgraded baseline database, with a rule for a non-ASCII counterparty name
+    engine = _create_baseline_database(tmp_path)
+    init_db(engine)
+    with Session(engine) as session:
+        session.execute(Transaction.__table__.update().where(Transaction.id == "t1").values(subcategory_id=None))
+        session.add(Category(id=1, name="Food"))
+        session.add(Subcategory(id=1, name="Coffee", category_id=1))
+        session.add(Rule(type=RuleType.COUNTERPARTY_NAME.value, pattern="Café de Éénhoorn", subcategory_id=1))
+        session.commit()
+
+        # WHEN applying the rules
+        count = apply_rules(session)
+
+        # THEN the backfilled lowercase name is matched
+        assert count == 1
+        assert session.get(Transaction, "t1").subcategory_id == 1
+    engine.dispose()
+
+
+def test_upgraded_database_is_searchable(tmp_path):
+    # GIVEN an upgraded baseline database
+    engine = _create_baseline_database(tmp_path)
+    init_db(engine)
+
+    with Session(engine) as session:
+        # WHEN searching its existing transactions
+        matches = get_transactions_by_text(session, "heijn")
+
+        # THEN they are found through the full-text index
+        assert [t.id for t in matches] == ["t3"]
+    engine.dispose()
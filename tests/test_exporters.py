@@ -0,0 +1,35 @@
+from datetime import date
+from decimal import Decimal
+
+from finanseer.models import Transaction, Category, Subcategory
+from finanseer.exporters import export_transactions_to_ynab_csv
+
+
+def test_export_transactions_to_ynab_csv(db_session, tmp_path):
+    # GIVEN a categorized debit and an uncategorized credit
+    db_session.add(Category(id=1, name="Food", subcategories=[Subcategory(id=1, name="Groceries")]))
+    db_session.add_all([
+        Transaction(id="t1", account_id="A1", transaction_date=date(2024, 1, 2), amount=Decimal("10.5"), currency="EUR", mutation_type="debit", bank_source="TestBank", counterparty_name="Shop, Inc.", description_raw="Weekly groceries", subcategory_id=1),
+        Transaction(id="t2", account_id="A1", transaction_date=date(2024, 1, 1), amount=Decimal("25.00"), currency="EUR", mutation_type="credit", bank_source="TestBank", counterparty_name="Employer"),
+    ])
+    db_session.commit()
+
+    # WHEN exporting
+    csv_file = tmp_path / "export.csv"
+    export_transactions_to_ynab_csv(db_session, str(csv_file))
+
+    # THEN the rows are written in date order, quoted where needed
+    assert csv_file.read_text(encoding="utf-8") == (
+        "Date,Payee,Memo,Outflow,Inflow,Category\n"
+        "01/01/2024,Employer,,,25.00,\n"
+        '01/02/2024,"Shop, Inc.",Weekly groceries,10.50,,Food: Groceries\n'
+    )
+
+
+def test_export_transactions_to_ynab_csv_empty_database(db_session, tmp_path):
+    # GIVEN an empty database, WHEN exporting
+    csv_file = tmp_path / "export.csv"
+    export_transactions_to_ynab_csv(db_session, str(csv_file))
+
+    # THEN no file is written
+    assert not csv_file.exists()
@@ -3,26 +3,11 @@ from datetime import date
 from decimal import Decimal
 
 import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 
-from finanseer.models import Base, Transaction, Category, Subcategory
+from finanseer import importers
+from finanseer.models import Transaction, Category, Subcategory
 from finanseer.importers import import_rabobank_csv, import_budget_categories
 
-# In-memory SQLite database for testing
-TEST_DATABASE_URL = "sqlite:///:memory:"
-
-@pytest.fixture(scope="function")
-def db_session():
-    """Create a new database session for a test."""
-    engine = create_engine(TEST_DATABASE_URL)
-    Base.metadata.create_all(engine)
-    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    session = Session()
-    yield session
-    session.close()
-    Base.metadata.drop_all(engine)
-
 
 RABO_CSV_CONTENT = """
 "IBAN/BBAN","Munt","BIC","Volgnr","Datum","Rentedatum","Bedrag","Saldo na trn","Tegenrekening IBAN/BBAN","Naam tegenpartij","Naam uiteindelijke partij","Naam initiërende partij","BIC tegenpartij","Code","Batch ID","Transactiereferentie","Machtigingskenmerk","Incassant ID","Betalingskenmerk","Omschrijving-1","Omschrijving-2","Omschrijving-3"
@@ -49,6 +34,7 @@ def test_import_rabobank_csv_success(db_session, tmp_path):
     assert t1.mutation_type == "debit"
     assert t1.counterparty_name == "Test Payee"
     assert t1.description_raw == "Test omschrijving 1"
+    assert t1.description_normalized == "test 1"
 
     # Check the second transaction
     t2 = db_session.query(Transaction).filter(Transaction.transaction_date == date(2024, 1, 2)).one()
@@ -56,6 +42,87 @@ def test_import_rabobank_csv_success(db_session, tmp_path):
     assert t2.mutation_type == "credit"
 
 
+def test_import_rabobank_csv_skips_existing_transactions(db_session, tmp_path):
+    # GIVEN a Rabobank CSV that has already been imported, with one transaction categorized since
+    csv_file = tmp_path / "rabo.csv"
+    csv_file.write_text(RABO_CSV_CONTENT)
+    import_rabobank_csv(db_session, str(csv_file))
+    t1 = db_session.query(Transaction).filter(Transaction.transaction_date == date(2024, 1, 1)).one()
+    t1.subcategory_id = 1
+    db_session.commit()
+
+    # WHEN importing the same file again
+    import_rabobank_csv(db_session, str(csv_file))
+
+    # THEN no duplicates are created and existing transactions are left as they were
+    assert db_session.query(Transaction).count() == 2
+    db_session.expire_all()
+    assert db_session.get(Transaction, t1.id).subcategory_id == 1
+
+
+RABO_CSV_INVALID_ROWS_CONTENT = """
+"IBAN/BBAN","Munt","BIC","Volgnr","Datum","Rentedatum","Bedrag","Saldo na trn","Tegenrekening IBAN/BBAN","Naam tegenpartij","Naam uiteindelijke partij","Naam initiërende partij","BIC tegenpartij","Code","Batch ID","Transactiereferentie","Machtigingskenmerk","Incassant ID","Betalingskenmerk","Omschrijving-1","Omschrijving-2","Omschrijving-3"
+"NL01RABO0123456789","EUR","RABONL2U","1","2024-01-01","2024-01-01","-10,50","+100,00","NL02RABO0987654321","Test Payee","","","","","","","","","","Deel 1"," ","Deel 3"
+"NL01RABO0123456789","EUR","RABONL2U","2","","2024-01-02","+25,00","+125,00","NL03RABO0112233445","No Date","","","","","","","","","","","",""
+"NL01RABO0123456789","EUR","RABONL2U","3","2024-13-01","2024-01-01","-10,50","+114,50","","Bad Date","","","","","","","","","","","",""
+"NL01RABO0123456789","EUR","RABONL2U","4","2024-01-03","2024-01-03","abc","+114,50","","Bad Amount","","","","","","","","","","","",""
+"""
+
+def test_import_rabobank_csv_skips_invalid_rows(db_session, tmp_path):
+    # GIVEN a Rabobank CSV with a missing date, an invalid date and an invalid amount
+    csv_file = tmp_path / "rabo.csv"
+    csv_file.write_text(RABO_CSV_INVALID_ROWS_CONTENT)
+
+    # WHEN importing the data
+    import_rabobank_csv(db_session, str(csv_file))
+
+    # THEN only the valid row is imported, with empty description parts left out
+    transactions = db_session.query(Transaction).all()
+    assert len(transactions) == 1
+    assert transactions[0].counterparty_name == "Test Payee"
+    assert transactions[0].description_raw == "Deel 1 Deel 3"
+
+
+# No Omschrijving-3 column, a description spanning two lines, empty and blank values, and
+# non-ASCII names, so both CSV readers have to handle the same awkward cases
+RABO_CSV_READER_CONTENT = """
+"IBAN/BBAN","Munt","Volgnr","Datum","Bedrag","Tegenrekening IBAN/BBAN","Naam tegenpartij","Omschrijving-1","Omschrijving-2"
+"NL01RABO0123456789","EUR","1","2024-01-01","-3,20","NL02RABO0987654321","Café 't Hoekje","Koffie"," "
+"NL01RABO0123456789","EUR","2","2024-01-02","+1250,00","","Werkgever B.V.","Salaris
+januari","Periode 01"
+"NL01RABO0123456789","EUR","3","2024-01-03","-7,50","","","","Bijschrijving"
+"NL01RABO0123456789","EUR","4","","-1,00","","Geen datum","",""
+"""
+
+
+def _import_transaction_rows(db_session, csv_file):
+    """Imports `csv_file` and returns every stored transaction as a tuple, ordered by ID."""
+    import_rabobank_csv(db_session, str(csv_file))
+    return [
+        (t.id, t.account_id, t.transaction_date, t.amount, t.currency, t.counterparty_name,
+         t.counterparty_iban, t.description_raw, t.description_normalized, t.mutation_type)
+        for t in db_session.query(Transaction).order_by(Transaction.id)
+    ]
+
+
+def test_import_rabobank_csv_pyarrow_matches_pandas(db_session, tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+
+    # GIVEN a latin-1 encoded Rabobank CSV with a missing column and multiline values
+    csv_file = tmp_path / "rabo.csv"
+    csv_file.write_text(RABO_CSV_READER_CONTENT, encoding="latin-1")
+
+    # WHEN importing it with pyarrow's reader and, into an empty table, with pandas' reader
+    pyarrow_rows = _import_transaction_rows(db_session, csv_file)
+    db_session.query(Transaction).delete()
+    monkeypatch.setattr(importers, "pa", None)
+    pandas_rows = _import_transaction_rows(db_session, csv_file)
+
+    # THEN both store the same transactions
+    assert len(pyarrow_rows) == 3
+    assert pyarrow_rows == pandas_rows
+
+
 BUDGET_CSV_CONTENT = """
 "Account","Category Group/Category","Category Group","Category"
 "Test Account","Bills: Rent","Bills","Rent"
@@ -81,3 +148,19 @@ def test_import_budget_categories_success(db_session, tmp_path):
     bills_subs = db_session.query(Subcategory).filter(Subcategory.category_id == categories[0].id).all()
     assert len(bills_subs) == 2
     assert {s.name for s in bills_subs} == {"Rent", "Utilities"}
+
+
+def test_import_budget_categories_is_idempotent(db_session, tmp_path):
+    # GIVEN a budget CSV that has already been imported
+    csv_file = tmp_path / "budget.csv"
+    csv_file.write_text(BUDGET_CSV_CONTENT)
+    import_budget_categories(db_session, str(csv_file))
+    rent_id = db_session.query(Subcategory.id).filter(Subcategory.name == "Rent").scalar()
+
+    # WHEN importing it again
+    import_budget_categories(db_session, str(csv_file))
+
+    # THEN nothing is duplicated and existing IDs are kept
+    assert db_session.query(Category).count() == 2
+    assert db_session.query(Subcategory).count() == 3
+    assert db_session.query(Subcategory.id).filter(Subcategory.name == "Rent").scalar() == rent_id
@@ -0,0 +1,32 @@
+from datetime import date
+from decimal import Decimal
+
+from finanseer.models import Transaction
+
+
+def test_description_normalized_follows_description_raw(db_session):
+    # GIVEN a stored transaction
+    db_session.add(Transaction(id="t1", account_id="A1", transaction_date=date(2024, 1, 1), amount=Decimal("10.00"), currency="EUR", description_raw="Betaling Albert Heijn", mutation_type="debit", bank_source="TestBank"))
+    db_session.commit()
+
+    # WHEN its raw description is changed
+    db_session.get(Transaction, "t1").description_raw = "Jumbo Utrecht"
+    db_session.commit()
+
+    # THEN the normalized description is updated with it
+    db_session.expire_all()
+    assert db_session.get(Transaction, "t1").description_normalized == "jumbo utrecht"
+
+
+def test_counterparty_name_lower_follows_counterparty_name(db_session):
+    # GIVEN a stored transaction
+    db_session.add(Transaction(id="t1", account_id="A1", transaction_date=date(2024, 1, 1), amount=Decimal("10.00"), currency="EUR", counterparty_name="Albert Heijn", mutation_type="debit", bank_source="TestBank"))
+    db_session.commit()
+
+    # WHEN its counterparty name is changed
+    db_session.get(Transaction, "t1").counterparty_name = "ÉÉNHOORN"
+    db_session.commit()
+
+    # THEN the lowercased name is updated with it
+    db_session.expire_all()
+    assert db_session.get(Transaction, "t1").counterparty_name_lower == "éénhoorn"
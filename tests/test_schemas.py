@@ -1,8 +1,15 @@
 from datetime import date
 from decimal import Decimal
 
+from hypothesis import given, strategies as st
+
 from finanseer.schemas import Transaction
 
+# Fields of a transaction, as the importer passes them to `generate_id`
+dates = st.dates()
+amounts = st.decimals(min_value=-1_000_000, max_value=1_000_000, places=2)
+optional_texts = st.none() | st.text()
+
 def test_transaction_generate_id_is_deterministic():
     """
     Tests that generating an ID for the same data twice produces the same hash.
@@ -61,3 +68,51 @@ def test_transaction_generate_id_is_sensitive_to_changes():
     # Change description
     id_desc_change = Transaction.generate_id(t_date, amount, counterparty_iban, counterparty_name, "Different Description")
     assert base_id != id_desc_change
+
+def test_transaction_generate_ids_matches_generate_id():
+    """
+    Tests that generating IDs in bulk gives the same hashes as generating them one by one.
+    """
+    dates = [date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 3)]
+    amounts = [Decimal("10.5"), Decimal("20.00"), Decimal("0.01")]
+    ibans = ["NL01RABO0123456789", None, ""]
+    names = ["Test Payee", " Other Payee ", None]
+    descriptions = ["Test Description", None, " Padded "]
+
+    ids = Transaction.generate_ids(dates, amounts, ibans, names, descriptions)
+
+    assert ids == [
+        Transaction.generate_id(*fields) for fields in zip(dates, amounts, ibans, names, descriptions)
+    ]
+
+def test_transaction_generate_id_is_stable():
+    """
+    Tests that the ID of a known transaction does not change, as stored IDs are
+    compared with newly generated ones to skip transactions imported before.
+    """
+    transaction_id = Transaction.generate_id(
+        date(2024, 1, 1), Decimal("10.5"), "NL01RABO0123456789", "Test Payee", "Test Description"
+    )
+
+    assert transaction_id == "e16fc8f2079b7f7b343fe4950046f4eff7736e09721b0b55c5e65e92c26cb0cc"
+
+@given(dates, amounts, st.text().filter(str.strip), optional_texts, optional_texts)
+def test_transaction_generate_id_ignores_surrounding_whitespace(t_date, amount, counterparty_iban, counterparty_name, description):
+    """
+    Tests that padding the counterparty and description with whitespace does not change the hash.
+    """
+    padded_description = f" {description}\t" if description is not None else None
+
+    assert Transaction.generate_id(
+        t_date, amount, f" {counterparty_iban} ", counterparty_name, padded_description
+    ) == Transaction.generate_id(t_date, amount, counterparty_iban, counterparty_name, description)
+
+@given(st.lists(st.tuples(dates, amounts, optional_texts, optional_texts, optional_texts), min_size=1, max_size=20))
+def test_transaction_generate_ids_matches_generate_id_for_any_fields(transactions):
+    """
+    Tests that generating IDs in bulk gives the same hashes as one by one, for arbitrary fields.
+    """
+    ids = Transaction.generate_ids(*zip(*transactions))
+
+    assert ids == [Transaction.generate_id(*fields) for fields in transactions]
+    assert all(len(transaction_id) == 64 for transaction_id in ids)
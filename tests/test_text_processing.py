@@ -1,4 +1,7 @@
-from finanseer.text_processing import normalize_description
+from hypothesis import given, strategies as st
+from unidecode import unidecode
+
+from finanseer.text_processing import STOPWORDS, normalize_description
 
 def test_normalize_description():
     """
@@ -19,6 +22,29 @@ def test_normalize_description():
     expected_numbers = "transactie 12345 met xyz 987"
     assert normalize_description(raw_text_numbers) == expected_numbers
 
+    # Test case with letters outside the Latin-1 range, and a non-Latin one
+    assert normalize_description("Straße Ærø Łódź Ωmega") == "strasse aero lodz omega"
+
     # Test empty and None input
     assert normalize_description("") == ""
     assert normalize_description(None) == ""
+
+@given(st.text())
+def test_normalize_description_is_idempotent(text):
+    """Tests that normalizing an already normalized description leaves it unchanged."""
+    normalized = normalize_description(text)
+    assert normalize_description(normalized) == normalized
+
+@given(st.text())
+def test_normalize_description_output_is_clean(text):
+    """Tests that the output is lowercase ASCII words, single-spaced, without stopwords."""
+    normalized = normalize_description(text)
+    assert normalized == normalized.strip() and "  " not in normalized
+    for token in normalized.split():
+        assert token.isascii() and token.isalnum() and token == token.lower()
+        assert token not in STOPWORDS
+
+@given(st.text(alphabet=st.characters(min_codepoint=0x20, max_codepoint=0x17F, categories=("L", "N", "Zs"))))
+def test_normalize_description_transliterates_latin_like_unidecode(text):
+    """Tests that Latin letters, accented or not, are transliterated exactly as unidecode does."""
+    assert normalize_description(text) == normalize_description(unidecode(text.lower()))